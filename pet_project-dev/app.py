@@ -1,39 +1,421 @@
-from flask import Flask, request, redirect, url_for, render_template, jsonify
+from flask import Flask, request, redirect, url_for, render_template, jsonify, abort, g, has_request_context, make_response
+from flask import stream_with_context
+from flask import before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
-from datetime import datetime
-import os, logging, random
+from sqlalchemy import text, event, select, update, delete as sql_delete, bindparam, tuple_, literal, MetaData
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.exc import IntegrityError
+from markupsafe import Markup
+from collections import Counter, namedtuple, OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from werkzeug.security import safe_join
+import os, io, re, sys, csv, json, logging, random, threading, time, base64, bisect, hashlib, itertools
+import shutil, tempfile
+import click
+
+from config import get_config
+import metrics
+import compression
 
 # В начале файла добавим константы статусов
 STATUS_NEW = 'new'
 STATUS_ACTIVE = 'active'
 STATUS_COMPLETED = 'completed'
+# Архивные задачи - завершенные, перенесенные в todo_archive (ключ счетчиков)
+STATUS_ARCHIVED = 'archived'
 
 # Инициализация Flask приложения
 app = Flask(__name__, static_folder='static')
-# Установка пути к базе данных SQLite
-db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), 'todos.db'))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Загрузка профиля конфигурации (APP_ENV / .env)
+app.config.from_object(get_config())
+# Путь к базе данных SQLite
+db_path = app.config['DATABASE_PATH']
 # Инициализация SQLAlchemy
 db = SQLAlchemy(app)
 
+# Установка PRAGMA профиля на каждом новом соединении с SQLite
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+with app.app_context():
+    event.listen(db.engine, 'connect', set_sqlite_pragmas)
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 
+# Метрики запросов в формате Prometheus (отдаются на /metrics)
+metrics_registry = metrics.Registry(app.config['METRICS_DIR'])
+REQUEST_DURATION = metrics_registry.register(metrics.Histogram(
+    'todo_request_duration_seconds', 'Полное время обработки запроса', ('endpoint', 'method')))
+SQL_DURATION = metrics_registry.register(metrics.Histogram(
+    'todo_request_sql_seconds', 'Суммарное время SQL за запрос', ('endpoint',)))
+SQL_QUERIES = metrics_registry.register(metrics.Histogram(
+    'todo_request_sql_queries', 'Количество SQL запросов за запрос', ('endpoint',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)))
+TEMPLATE_DURATION = metrics_registry.register(metrics.Histogram(
+    'todo_request_template_seconds', 'Время отрисовки шаблонов за запрос', ('endpoint',)))
+REQUESTS = metrics_registry.register(metrics.Counter(
+    'todo_requests_total', 'Количество обработанных запросов', ('endpoint', 'method', 'status')))
+
+# Учет времени SQL запросов в рамках HTTP запроса
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'sql_count' in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+        # Тексты запросов сохраняются только при включенном логе медленных запросов
+        if app.config['SLOW_REQUEST_MS']:
+            g.sql_statements.append((elapsed, statement))
+
+with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+
+# Учет времени отрисовки шаблонов
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.template_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def stop_template_timer(sender, template, context, **extra):
+    if 'template_start' in g:
+        g.template_time += time.perf_counter() - g.pop('template_start')
+
+# Функция отрисовки фрагмента шаблона вне render_template (сигналы Flask
+# для нее не отправляются, поэтому время учитывается здесь)
+def render_fragment(name, **context):
+    start = time.perf_counter()
+    try:
+        return app.jinja_env.get_template(name).render(**context)
+    finally:
+        if has_request_context() and 'template_time' in g:
+            g.template_time += time.perf_counter() - start
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    g.template_time = 0.0
+    g.sql_statements = []
+
+# Заголовок Server-Timing, метрики и лог медленных запросов
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' not in g:
+        return response
+    total = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or 'unknown'
+    
+    response.headers['Server-Timing'] = (
+        f'db;dur={g.sql_time * 1000:.2f};desc="{g.sql_count} queries", '
+        f'tpl;dur={g.template_time * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}')
+    
+    REQUEST_DURATION.observe(total, endpoint, request.method)
+    SQL_DURATION.observe(g.sql_time, endpoint)
+    SQL_QUERIES.observe(g.sql_count, endpoint)
+    TEMPLATE_DURATION.observe(g.template_time, endpoint)
+    REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    metrics_registry.start_spool()
+    
+    slow_ms = app.config['SLOW_REQUEST_MS']
+    if slow_ms and total * 1000 >= slow_ms:
+        statements = '\n'.join(f'  {elapsed * 1000:8.2f} ms  {statement}'
+                               for elapsed, statement in g.sql_statements)
+        logging.warning(f"Медленный запрос {request.method} {request.full_path}: {total * 1000:.1f} мс, "
+                        f"SQL {g.sql_count} ({g.sql_time * 1000:.1f} мс), "
+                        f"шаблоны {g.template_time * 1000:.1f} мс\n{statements}")
+    return response
+
+# Статические файлы: отпечатки содержимого и сжатые копии в памяти процесса
+# Адреса статики содержат отпечаток (?v=...), поэтому такие ответы кэшируются
+# браузером навсегда, а новая версия файла получает новый адрес
+class StaticFiles:
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.fingerprints = {}  # имя файла -> (mtime, отпечаток)
+        self.compressed = {}  # (имя файла, кодировка) -> (отпечаток, сжатые данные)
+
+    def _path(self, filename):
+        return safe_join(self.folder, filename)
+
+    def fingerprint(self, filename):
+        path = self._path(filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except (TypeError, OSError):
+            return None
+        cached = self.fingerprints.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with self.lock:
+            self.fingerprints[filename] = (mtime, digest)
+        return digest
+
+    def compress(self, filename, encoding):
+        fingerprint = self.fingerprint(filename)
+        cached = self.compressed.get((filename, encoding))
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        with open(self._path(filename), 'rb') as f:
+            data = compression.compress(f.read(), encoding, 9)
+        with self.lock:
+            self.compressed[(filename, encoding)] = (fingerprint, data)
+        return data
+
+static_files = StaticFiles(app.static_folder)
+
+# Версия шаблонов и статики: входит в ETag страниц, чтобы после
+# обновления приложения браузеры не получали 304 на старую разметку
+def compute_asset_version():
+    digest = hashlib.sha256()
+    for folder in (app.template_folder, app.static_folder):
+        root = os.path.join(app.root_path, folder)
+        for directory, _, files in sorted(os.walk(root)):
+            for name in sorted(files):
+                with open(os.path.join(directory, name), 'rb') as f:
+                    digest.update(name.encode() + f.read())
+    return digest.hexdigest()[:12]
+
+asset_version = compute_asset_version()
+
+# Добавление отпечатка к адресам статики: url_for('static', filename=...)
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        fingerprint = static_files.fingerprint(values['filename'])
+        if fingerprint:
+            values['v'] = fingerprint
+
+# Долгое кэширование статики, запрошенной по адресу с актуальным отпечатком
+@app.after_request
+def cache_static_files(response):
+    if request.endpoint == 'static' and response.status_code == 200:
+        fingerprint = request.args.get('v')
+        if fingerprint and fingerprint == static_files.fingerprint(request.view_args['filename']):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config['STATIC_MAX_AGE']
+            response.cache_control.immutable = True
+    return response
+
+# Сжатие HTML, JSON и статики (gzip, brotli при наличии пакета)
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in compression.COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compression.negotiate(request.accept_encodings)
+    if not encoding:
+        return response
+    if request.endpoint == 'static':
+        # Статика сжимается один раз на версию файла
+        data = static_files.compress(request.view_args['filename'], encoding)
+        response.close()
+        response.direct_passthrough = False
+    elif response.is_streamed:
+        # Потоковые ответы отдаются как есть
+        return response
+    else:
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+        data = compression.compress(data, encoding, app.config['COMPRESS_LEVEL'])
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('Accept-Ranges', None)
+    # Сжатое представление отличается побайтно - ETag становится слабым
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
 # Обработка зависимости для часовых поясов
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
 except ImportError:
     from pytz import timezone as ZoneInfo  # Для старых версий Python
     
+# Класс версий данных, общих для всех процессов приложения.
+# Версия - это время изменения файла-метки рядом с базой, поэтому проверка
+# стоит одного системного вызова stat и не обращается к SQLite
+class DataVersion:
+    def __init__(self, base_path):
+        self.base_path = base_path
+
+    def _path(self, kind):
+        return f'{self.base_path}-{kind}.version'
+
+    def get(self, kind):
+        try:
+            return os.stat(self._path(kind)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self, *kinds):
+        for kind in kinds:
+            path = self._path(kind)
+            # Новая версия всегда больше предыдущей, даже при грубом разрешении mtime
+            version = max(time.time_ns(), self.get(kind) + 1)
+            with open(path, 'a'):
+                pass
+            os.utime(path, ns=(version, version))
+
+data_version = DataVersion(db_path)
+
+# Функция отметки измененных данных в текущей транзакции
+# Версии увеличиваются только после успешного коммита
+def mark_changed(*kinds):
+    db.session.info.setdefault('changed', set()).update(kinds)
+
+@event.listens_for(db.session, 'after_commit')
+def bump_data_versions(session):
+    kinds = session.info.pop('changed', None)
+    if kinds:
+        data_version.bump(*kinds)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_data_versions(session):
+    session.info.pop('changed', None)
+    session.info.pop('new_events', None)
+
+# Функция ответа с проверкой If-None-Match/If-Modified-Since по версиям данных
+# Версии читаются до построения ответа (stat файлов-меток, без запросов к базе),
+# и если клиент уже получил текущую версию, возвращается пустой 304
+# max_age=None - браузер проверяет актуальность при каждом обращении
+# extra - другие значения, от которых зависит ответ (добавляются в ETag)
+def conditional_response(kinds, render, max_age=None, extra=()):
+    if request.method not in ('GET', 'HEAD'):
+        return render()
+    versions = [data_version.get(kind) for kind in kinds]
+    key = '|'.join([request.full_path, asset_version, *map(str, extra)] + [str(version) for version in versions])
+    etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+    last_modified = datetime.fromtimestamp(max(versions) / 1e9, timezone.utc) if max(versions) else None
+    
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = bool(last_modified and request.if_modified_since
+                            and last_modified.replace(microsecond=0) <= request.if_modified_since)
+    response = app.response_class(status=304) if not_modified else make_response(render())
+    if response.status_code not in (200, 304):
+        return response
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response
+
+# Кэш счетчиков задач в памяти процесса
+# Сбрасывается при изменении версии 'tasks' (в том числе из другого процесса)
+class TaskCountsCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.counts = None
+
+    def get(self):
+        # Версия читается до запроса, поэтому параллельное изменение
+        # приведет к повторной загрузке, а не к устаревшим данным
+        version = data_version.get('tasks')
+        with self.lock:
+            if version != self.version:
+                counts = {STATUS_NEW: 0, STATUS_ACTIVE: 0, STATUS_COMPLETED: 0, STATUS_ARCHIVED: 0}
+                counts.update(db.session.execute(select(TaskCounter.status, TaskCounter.count)).all())
+                self.version, self.counts = version, counts
+            return dict(self.counts)
+
+task_counts_cache = TaskCountsCache()
+
 # Функция для получения счетчиков задач
 def get_task_counts():
-    return {
-        STATUS_NEW: Todo.query.filter_by(status=STATUS_NEW).count(),
-        STATUS_ACTIVE: Todo.query.filter_by(status=STATUS_ACTIVE).count(),
-        STATUS_COMPLETED: Todo.query.filter_by(status=STATUS_COMPLETED).count()
-    }
+    return task_counts_cache.get()
+
+# Функция записи изменений счетчиков задач {статус: +N/-N} через соединение или сессию
+def upsert_task_counts(conn, deltas):
+    for status, delta in deltas.items():
+        if delta:
+            stmt = sqlite_insert(TaskCounter).values(status=status, count=delta)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=[TaskCounter.status],
+                set_={'count': TaskCounter.count + stmt.excluded.count}))
+
+# Функция изменения счетчиков задач {статус: +N/-N} в текущей транзакции
+def adjust_task_counts(deltas):
+    upsert_task_counts(db.session, deltas)
+    mark_changed('tasks')
+
+# Функция захвата блокировки записи SQLite в начале транзакции сессии
+# Задача, прочитанная после нее, не изменится другим запросом до коммита
+def begin_write():
+    connection = db.session.connection()
+    # Транзакция с уже выполненной записью (например, возврат из архива) блокировку держит
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+# Функция смены статуса задачи вместе со счетчиками
+# Задача читается вне транзакции, поэтому перед изменением строка перечитывается
+# под блокировкой записи: если статус уже не тот, что видел запрос, возвращается
+# False (задачу изменил другой запрос). Счетчики, событие и статистика по дням
+# считаются от перечитанной строки и меняются только вместе с UPDATE
+def change_status(todo, status, **values):
+    begin_write()
+    table = Todo.__table__
+    row = db.session.execute(
+        select(table.c.started_at, table.c.completed_at)
+        .where(table.c.id == todo.id, table.c.status == todo.status)).first()
+    if row is None:
+        return False
+    result = db.session.execute(
+        update(table).where(table.c.id == todo.id, table.c.status == todo.status)
+        .values(status=status, **values))
+    if result.rowcount != 1:
+        return False
+    previous = todo.status
+    tag_ids = db.session.execute(
+        select(todo_tag.c.tag_id).where(todo_tag.c.todo_id == todo.id)).scalars().all()
+    before = rollup_state(previous, todo.created_at, row.started_at, row.completed_at, tag_ids)
+    # Объект приводится к записанной строке без повторного UPDATE при flush
+    written = {'started_at': row.started_at, 'completed_at': row.completed_at,
+               **values, 'status': status}
+    for key, value in written.items():
+        set_committed_value(todo, key, value)
+    adjust_rollups([(before, rollup_state(status, todo.created_at, todo.started_at,
+                                          todo.completed_at, tag_ids))])
+    if previous != status:
+        adjust_task_counts(Counter({previous: -1, status: 1}))
+        record_events([task_event('status', todo.id, status, previous)])
+    else:
+        mark_changed('tasks')
+    return True
+
+# Функция полного пересчета счетчиков задач одним запросом GROUP BY
+def recount_task_counters(conn):
+    conn.execute(text("DELETE FROM task_counter"))
+    conn.execute(text("INSERT INTO task_counter (status, count) "
+                      "SELECT status, COUNT(*) FROM todo GROUP BY status"))
+    # Архив появляется в поздней миграции, раньше его считать не нужно
+    if table_exists(conn, 'todo_archive'):
+        conn.execute(text("INSERT INTO task_counter (status, count) "
+                          "SELECT :status, COUNT(*) FROM todo_archive"), {'status': STATUS_ARCHIVED})
     
 # Функция генерации случайного цвета в HEX формате
 def random_color():
@@ -49,6 +431,47 @@ def get_moscow_time():
         import pytz
         return datetime.now(pytz.timezone("Europe/Moscow"))
 
+# Таблица связи задач и тегов (многие ко многим)
+# Первичный ключ (tag_id, todo_id) служит индексом для фильтрации по тегу,
+# дополнительный индекс (todo_id, tag_id) - для получения тегов задачи
+todo_tag = db.Table(
+    'todo_tag',
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('todo_id', db.Integer, db.ForeignKey('todo.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_todo_tag_todo', 'todo_id', 'tag_id'),
+)
+
+# Очередь тегов, связи которых изменились после последнего пересчета
+# Заполняется триггерами на todo_tag, разбирается инкрементальным пересчетом
+tag_recount_queue = db.Table(
+    'tag_recount_queue',
+    db.Column('tag_id', db.Integer, primary_key=True),
+)
+
+# События изменения задач для потока /api/events
+# Пишутся в той же транзакции, что и само изменение, поэтому все процессы
+# видят событие тогда же, когда и изменение. AUTOINCREMENT - id не переиспользуются
+change_event = db.Table(
+    'change_event',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('payload', db.Text, nullable=False),
+    sqlite_autoincrement=True,
+)
+
+# Сводная статистика по дням: сколько задач взято в работу и завершено,
+# суммы времени выполнения (lead - от создания, cycle - от начала работы, сек).
+# tag_id = 0 - все задачи. Обновляется в той же транзакции, что и задачи
+daily_rollup = db.Table(
+    'daily_rollup',
+    db.Column('tag_id', db.Integer, primary_key=True),
+    db.Column('day', db.String(10), primary_key=True),
+    db.Column('started', db.Integer, nullable=False, default=0),
+    db.Column('completed', db.Integer, nullable=False, default=0),
+    db.Column('lead_seconds', db.Integer, nullable=False, default=0),
+    db.Column('cycle_seconds', db.Integer, nullable=False, default=0),
+    db.Index('idx_daily_rollup_day', 'day', 'tag_id'),
+)
+
 # Класс задачи
 class Todo(db.Model):
     id = db.Column(db.Integer, primary_key=True) # id задачи
@@ -60,6 +483,17 @@ class Todo(db.Model):
     completed_at = db.Column(db.DateTime) # Поле когда задача завершена
     updated_at = db.Column(db.DateTime)  # Поле когда задачу отредактировали
     is_edited = db.Column(db.Boolean, default=False)  # Флаг редактирования
+    # Составные индексы для курсорной пагинации вкладок
+    __table_args__ = (
+        db.Index('idx_todo_status_created', 'status', 'created_at', 'id'),
+        db.Index('idx_todo_status_started', 'status', 'started_at', 'id'),
+        db.Index('idx_todo_status_completed', 'status', 'completed_at', 'id'),
+        # id не переиспользуются: задачи из архива возвращаются со своим id
+        {'sqlite_autoincrement': True},
+    )
+    # Теги задачи через таблицу связи (строка tags хранится для совместимости)
+    tag_list = db.relationship('Tag', secondary=todo_tag, order_by='Tag.name')
+    archived = False
     
 # Класс тега
 class Tag(db.Model):
@@ -67,78 +501,1337 @@ class Tag(db.Model):
     name = db.Column(db.String(50), unique=True, nullable=False) # Уникальное имя тега
     color = db.Column(db.String(7), default='#6c757d')  # Цвет в HEX формате
     usage_count = db.Column(db.Integer, default=0)  # Счетчик использования
-    __table_args__ = (db.Index('idx_tag_name', 'name'),) # Индекс для ускорения поиска
-        
+    __table_args__ = (
+        db.Index('idx_tag_name', 'name'),  # Индекс для ускорения поиска
+        db.Index('idx_tag_usage', usage_count.desc(), name),  # Популярные теги без сортировки
+    )
+
+# Класс счетчика задач по статусам (обновляется вместе со сменой статуса)
+class TaskCounter(db.Model):
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# Связи архивных задач с тегами (устроена так же, как todo_tag)
+todo_archive_tag = db.Table(
+    'todo_archive_tag',
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('todo_id', db.Integer, db.ForeignKey('todo_archive.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_todo_archive_tag_todo', 'todo_id', 'tag_id'),
+)
+
+# Класс архивной задачи
+# Завершенные задачи старше ARCHIVE_AFTER_DAYS переносятся из todo вместе со
+# связями, поэтому рабочая таблица и ее индексы остаются небольшими.
+# Колонки те же, что у todo; индекс - для вкладки завершенных с архивом
+class ArchivedTodo(db.Model):
+    __tablename__ = 'todo_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    task = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    tags = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    is_edited = db.Column(db.Boolean, default=False)
+    __table_args__ = (db.Index('idx_todo_archive_completed', 'completed_at', 'id'),)
+    tag_list = db.relationship('Tag', secondary=todo_archive_tag, order_by='Tag.name', viewonly=True)
+    archived = True
+
+# Функция разбиения списка на части (ограничение числа параметров SQLite)
+def chunked(items, size=1000):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# Функция разбиения любой последовательности (в том числе генератора) на списки
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+# Функция разбора строки тегов в список уникальных имен (порядок сохраняется)
+def parse_tags(tags_str):
+    return list(dict.fromkeys(t.strip() for t in (tags_str or '').split(',') if t.strip()))
+
+# Функция применения изменений счетчиков тегов {имя: +N/-N}
+# Одним запросом загружает затронутые теги, создает новые и удаляет неиспользуемые.
+# Возвращает словарь {имя: Tag} для оставшихся тегов
+def apply_tag_deltas(deltas):
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+    tags = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(deltas)).all()}
+    for name, delta in deltas.items():
+        tag = tags.get(name)
+        if tag is None:
+            if delta < 0:
+                continue
+            # Создание нового тега
+            tag = Tag(name=name, usage_count=0, color=random_color())
+            db.session.add(tag)
+            tags[name] = tag
+            mark_changed('tag_styles')
+        tag.usage_count = max((tag.usage_count or 0) + delta, 0)
+        mark_changed('tags')
+        # Удаление тега если он больше не используется
+        if tag.usage_count == 0:
+            db.session.delete(tag)
+            del tags[name]
+            mark_changed('tag_styles')
+    return tags
+
+# Функция замены тегов задачи с обновлением счетчиков
+def set_todo_tags(todo, tag_names):
+    current = {tag.name: tag for tag in todo.tag_list}
+    deltas = Counter({name: -1 for name in current if name not in tag_names})
+    deltas.update({name: 1 for name in tag_names if name not in current})
+    current.update(apply_tag_deltas(deltas))
+    todo.tag_list = [current[name] for name in tag_names]
+    todo.tags = ', '.join(tag_names)
+
+# Описание тега в реестре (без ORM объекта)
+TagInfo = namedtuple('TagInfo', 'name color usage_count')
+# Снимок реестра тегов: поколение и словарь {имя: цвет}
+TagSnapshot = namedtuple('TagSnapshot', 'generation colors')
+
+# Индекс имен тегов для автодополнения
+# Хранит только имена и перестраивается при создании и удалении тегов.
+# Префиксный поиск - бинарный поиск по отсортированным именам, поиск подстроки -
+# str.find по всем именам, склеенным в одну строку (промах не требует прохода по
+# тегам в Python). Совпадения ранжируются по счетчикам из базы: небольшой набор -
+# запросом IN, большой - проходом по индексу idx_tag_usage до первых N совпадений
+class TagSearchIndex:
+    # Наборы совпадений больше этого размера не ранжируются запросом IN,
+    # а просматриваются в порядке популярности
+    RANK_RANGE_LIMIT = 500
+
+    def __init__(self, names):
+        by_name = sorted((name.lower(), name) for name in names)
+        self.keys = [key for key, _ in by_name]
+        self.names = [name for _, name in by_name]
+        self.text = '\n'.join(self.keys)
+        # Начало каждого имени в склеенной строке
+        self.offsets = list(itertools.accumulate((len(key) + 1 for key in self.keys), initial=0))
+
+    def prefix(self, query, limit=10):
+        query = query.lower()
+        lo = bisect.bisect_left(self.keys, query)
+        hi = bisect.bisect_left(self.keys, query + '\U0010ffff')
+        if hi - lo > self.RANK_RANGE_LIMIT:
+            return self._scan(lambda key: key.startswith(query), limit)
+        return self._rank(self.names[lo:hi], limit)
+
+    def substring(self, query, limit=10):
+        query = query.lower()
+        if '\n' in query:
+            return []
+        matches = []
+        pos = self.text.find(query)
+        while pos != -1:
+            i = bisect.bisect_right(self.offsets, pos) - 1
+            matches.append(self.names[i])
+            if len(matches) > self.RANK_RANGE_LIMIT:
+                return self._scan(lambda key: query in key, limit)
+            pos = self.text.find(query, self.offsets[i + 1])
+        return self._rank(matches, limit)
+
+    def _rank(self, names, limit):
+        if not names:
+            return []
+        return db.session.execute(
+            select(Tag.name).where(Tag.name.in_(names))
+            .order_by(Tag.usage_count.desc(), Tag.name).limit(limit)).scalars().all()
+
+    def _scan(self, match, limit):
+        result = []
+        # Строки читаются порциями: просмотр обычно останавливается в начале индекса
+        rows = db.session.execute(select(Tag.name).order_by(Tag.usage_count.desc(), Tag.name)
+                                  .execution_options(yield_per=100))
+        try:
+            for name in rows.scalars():
+                if match(name.lower()):
+                    result.append(name)
+                    if len(result) >= limit:
+                        break
+        finally:
+            rows.close()
+        return result
+
+# Реестр тегов в памяти процесса
+# Словарь {имя: цвет} перечитывается только при изменении версии 'tag_styles'
+# (создание и удаление тегов). Счетчики меняются при каждой задаче с тегами,
+# поэтому популярные теги берутся запросом по индексу idx_tag_usage на версию 'tags'
+class TagRegistry:
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.lock = threading.Lock()
+        self._snapshot = TagSnapshot(None, {})
+        self._popular = (None, [])
+        self._search = (None, None)
+
+    def snapshot(self):
+        generation = self.style_generation()
+        if generation != self._snapshot.generation:
+            with self.lock:
+                if generation != self._snapshot.generation:
+                    rows = db.session.execute(select(Tag.name, Tag.color)).all()
+                    self._snapshot = TagSnapshot(
+                        generation, {name: color or '#6c757d' for name, color in rows})
+        return self._snapshot
+
+    def popular(self):
+        generation = data_version.get('tags')
+        cached, popular = self._popular
+        if generation != cached:
+            rows = db.session.execute(
+                select(Tag.name, Tag.color, Tag.usage_count)
+                .order_by(Tag.usage_count.desc(), Tag.name).limit(self.top_n))
+            popular = [TagInfo(name, color or '#6c757d', usage_count or 0)
+                       for name, color, usage_count in rows]
+            self._popular = (generation, popular)
+        return popular
+
+    # Поколение внешнего вида тегов (имя и цвет) - меняется только при
+    # создании и удалении тегов, но не при изменении счетчиков
+    def style_generation(self):
+        return data_version.get('tag_styles')
+
+    # Индекс автодополнения строится лениво, один раз на поколение имен тегов
+    def search_index(self):
+        snapshot = self.snapshot()
+        generation, index = self._search
+        if generation != snapshot.generation:
+            index = TagSearchIndex(snapshot.colors)
+            self._search = (snapshot.generation, index)
+        return snapshot.generation, index
+
+tag_registry = TagRegistry()
+
+# LRU кэш отрисованных HTML фрагментов с ограничением по памяти
+class FragmentCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= sys.getsizeof(old)
+            self.items[key] = value
+            self.size += size
+            # Вытеснение давно не использованных фрагментов
+            while self.size > self.max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= sys.getsizeof(evicted)
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_BYTES'])
+
+# Функция загрузки тегов нескольких задач одним запросом {id задачи: [TagInfo]}
+# links - таблица связи (todo_archive_tag для архивных задач)
+def load_todo_tags(todo_ids, links=todo_tag):
+    tags = {}
+    for chunk in chunked(list(todo_ids)):
+        rows = db.session.execute(
+            select(links.c.todo_id, Tag.name, Tag.color, Tag.usage_count)
+            .join(Tag, Tag.id == links.c.tag_id)
+            .where(links.c.todo_id.in_(chunk)).order_by(Tag.name))
+        for todo_id, name, color, usage_count in rows:
+            tags.setdefault(todo_id, []).append(TagInfo(name, color, usage_count))
+    return tags
+
+# Функция отрисовки карточек задач с кэшированием
+# Ключ карточки включает все поля, которые в ней отображаются, поэтому
+# любое изменение задачи или цвета тегов дает новый ключ, а старый вытесняется
+def render_task_cards(todos):
+    style = tag_registry.style_generation()
+    keys = {todo.id: ('card', todo.id, todo.status, todo.updated_at,
+                      todo.started_at, todo.completed_at, style) for todo in todos}
+    cards = {todo.id: fragment_cache.get(keys[todo.id]) for todo in todos}
+    missing = [todo for todo in todos if cards[todo.id] is None]
+    if missing:
+        # Теги загружаются только для задач, которых нет в кэше
+        tags = load_todo_tags(todo.id for todo in missing if not todo.archived)
+        tags.update(load_todo_tags((todo.id for todo in missing if todo.archived), todo_archive_tag))
+        for todo in missing:
+            card = Markup(render_fragment('_task_card.html', todo=todo, tags=tags.get(todo.id, [])))
+            fragment_cache.set(keys[todo.id], card)
+            cards[todo.id] = card
+    return [cards[todo.id] for todo in todos]
+
+# Функция отрисовки бейджей тегов с кэшированием
+def render_tag_badges(tags):
+    key = ('badges', tuple((tag.name, tag.color) for tag in tags))
+    badges = fragment_cache.get(key)
+    if badges is None:
+        badges = Markup(render_fragment('_tag_badges.html', tags=tags))
+        fragment_cache.set(key, badges)
+    return badges
+
+# Функция построения события задачи
+# type: created, status, edited, deleted; status - текущий статус (None у удаленной),
+# previous - статус до изменения. counters - изменения счетчиков {статус: +1/-1}
+def task_event(type, todo_id, status, previous=None, tags=None):
+    event = {'type': type, 'id': todo_id, 'status': status}
+    counters = {}
+    if previous != status:
+        if previous:
+            counters[previous] = -1
+        if status:
+            counters[status] = 1
+    event['counters'] = counters
+    if tags is not None:
+        event['tags'] = tags
+    return event
+
+# Функция записи событий в текущей транзакции
+def record_events(events):
+    if not events:
+        return
+    db.session.execute(change_event.insert(),
+                       [{'payload': json.dumps(e, ensure_ascii=False)} for e in events])
+    mark_changed('events')
+    db.session.info['new_events'] = True
+
+# Лента изменений процесса: один поток читает новые события из таблицы
+# change_event и будит всех подписчиков через Condition. Подписчик потока
+# событий только ждет на Condition, поэтому открытые соединения не
+# создают нагрузки на базу, сколько бы их ни было
+class ChangeFeed:
+    def __init__(self, buffer_size=1000):
+        self.condition = threading.Condition()
+        self.buffer = deque(maxlen=buffer_size)  # (id, событие)
+        self.last_id = 0
+        self.counters = None
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.pruned_at = 0
+
+    # Поток запускается при первом подписчике (в каждом процессе после fork)
+    def start(self):
+        with self.condition:
+            if self.thread and self.thread.is_alive():
+                return
+            with app.app_context():
+                self.last_id = db.session.execute(select(db.func.max(change_event.c.id))).scalar() or 0
+                self.counters = get_task_counts()
+            self.thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        version = None
+        while True:
+            # Изменения в этом процессе будят поток сразу, из других - через интервал
+            self.wakeup.wait(app.config['CHANGE_FEED_POLL_INTERVAL'])
+            self.wakeup.clear()
+            current = data_version.get('events')
+            if current == version:
+                continue
+            try:
+                with app.app_context():
+                    self._poll()
+                    self._prune()
+                version = current
+            except Exception:
+                logging.exception("Ошибка чтения ленты изменений")
+
+    def _poll(self):
+        rows = db.session.execute(
+            select(change_event.c.id, change_event.c.payload)
+            .where(change_event.c.id > self.last_id).order_by(change_event.c.id)).all()
+        if not rows:
+            return
+        counters = get_task_counts()
+        with self.condition:
+            self.buffer.extend((id, json.loads(payload)) for id, payload in rows)
+            self.last_id = rows[-1].id
+            self.counters = counters
+            self.condition.notify_all()
+
+    # Удаление старых событий (не чаще раза в минуту)
+    def _prune(self):
+        if time.monotonic() - self.pruned_at < 60:
+            return
+        self.pruned_at = time.monotonic()
+        keep = app.config['CHANGE_EVENTS_KEEP']
+        if self.last_id > keep:
+            db.session.execute(sql_delete(change_event).where(change_event.c.id <= self.last_id - keep))
+            db.session.commit()
+
+    # Ожидание событий после event_id: (последний id, события, счетчики)
+    # События None - подписчик отстал больше чем на размер буфера
+    def wait(self, event_id, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_id > event_id, timeout)
+            # Буфер содержит события после first_id
+            first_id = self.buffer[0][0] - 1 if self.buffer else self.last_id
+            if event_id < first_id:
+                return self.last_id, None, self.counters
+            return self.last_id, [item for item in self.buffer if item[0] > event_id], self.counters
+
+change_feed = ChangeFeed()
+
+# Открытые потоки /api/events в этом процессе: каждый занимает поток gunicorn
+# на время соединения, поэтому их число ограничено, чтобы обычным запросам
+# оставались свободные потоки
+sse_slots = threading.BoundedSemaphore(app.config['SSE_MAX_STREAMS'])
+
+@event.listens_for(db.session, 'after_commit')
+def wake_change_feed(session):
+    if session.info.pop('new_events', None):
+        change_feed.wakeup.set()
+
+# Функция форматирования сообщения Server-Sent Events
+def sse_message(data, event=None, id=None):
+    lines = []
+    if id is not None:
+        lines.append(f'id: {id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+# Пересчет счетчиков тегов агрегацией по таблице связи (индекс по tag_id)
+# Архивные задачи тоже учитываются: архивация переносит связи, не меняя счетчиков
+TAG_USAGE_SQL = ("UPDATE tag SET usage_count = (SELECT COUNT(*) FROM todo_tag WHERE todo_tag.tag_id = tag.id) "
+                 "+ (SELECT COUNT(*) FROM todo_archive_tag WHERE todo_archive_tag.tag_id = tag.id)")
+
+# Триггеры, отмечающие теги с измененными связями для инкрементального пересчета
+TAG_RECOUNT_SQL = [
+    """CREATE TRIGGER IF NOT EXISTS todo_tag_recount_insert AFTER INSERT ON todo_tag BEGIN
+        INSERT OR IGNORE INTO tag_recount_queue (tag_id) VALUES (new.tag_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS todo_tag_recount_delete AFTER DELETE ON todo_tag BEGIN
+        INSERT OR IGNORE INTO tag_recount_queue (tag_id) VALUES (old.tag_id);
+    END""",
+]
+
+def create_tag_recount_triggers(conn):
+    for sql in TAG_RECOUNT_SQL:
+        conn.execute(text(sql))
+
+# Функция удаления тегов, которые больше не используются (как в apply_tag_deltas)
+def delete_unused_tags(*where):
+    if db.session.execute(sql_delete(Tag).where(Tag.usage_count == 0, *where)).rowcount:
+        mark_changed('tag_styles')
+
+# Функция пересчета счетчиков использования тегов
+# Полный режим - один UPDATE по всем тегам.
+# Инкрементальный - только теги из очереди, короткими транзакциями по batch_size,
+# чтобы не держать блокировку записи. Теги с нулевым счетчиком удаляются в той же
+# транзакции. Возвращает число пересчитанных тегов
+def recount_tags(incremental=False, batch_size=500):
+    if not incremental:
+        total = db.session.execute(text(TAG_USAGE_SQL)).rowcount
+        delete_unused_tags()
+        db.session.execute(sql_delete(tag_recount_queue))
+        mark_changed('tags')
+        db.session.commit()
+        return total
+    
+    total = 0
+    recount = text(TAG_USAGE_SQL + " WHERE tag.id IN :ids").bindparams(bindparam('ids', expanding=True))
+    while True:
+        ids = db.session.execute(select(tag_recount_queue.c.tag_id).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        db.session.execute(recount, {'ids': ids})
+        delete_unused_tags(Tag.id.in_(ids))
+        db.session.execute(sql_delete(tag_recount_queue).where(tag_recount_queue.c.tag_id.in_(ids)))
+        mark_changed('tags')
+        db.session.commit()
+        total += len(ids)
+    return total
+
+# Функция заполнения таблицы связи из строковых тегов (для старых баз)
+def backfill_todo_tags(conn, batch_size=5000):
+    tag_ids = dict(conn.execute(text("SELECT name, id FROM tag")).all())
+    rows = conn.execute(text("SELECT id, tags FROM todo WHERE tags IS NOT NULL AND tags != ''")).all()
+    links = []
+    for todo_id, tags_str in rows:
+        for name in parse_tags(tags_str):
+            if name not in tag_ids:
+                tag_ids[name] = conn.execute(
+                    text("INSERT INTO tag (name, color, usage_count) VALUES (:name, :color, 0)"),
+                    {'name': name, 'color': random_color()}).lastrowid
+            links.append({'tag_id': tag_ids[name], 'todo_id': todo_id})
+        if len(links) >= batch_size:
+            conn.execute(todo_tag.insert(), links)
+            links = []
+    if links:
+        conn.execute(todo_tag.insert(), links)
+    # Пересчет счетчиков по таблице связи (архива на этом шаге миграций еще нет)
+    conn.execute(text("UPDATE tag SET usage_count = "
+                      "(SELECT COUNT(*) FROM todo_tag WHERE todo_tag.tag_id = tag.id)"))
+
+# Размер страницы списков задач
+PAGE_SIZE = 20
+# Максимальный размер страницы для API
+MAX_PAGE_SIZE = 100
+
+# Колонки сортировки вкладок (по убыванию, при равенстве - по id)
+TAB_SORT_COLUMNS = {
+    STATUS_NEW: Todo.created_at,
+    STATUS_ACTIVE: Todo.started_at,
+    STATUS_COMPLETED: Todo.completed_at,
+}
+
+# Функции кодирования курсора пагинации: значение колонки сортировки и id
+def encode_cursor(value, id):
+    raw = f"{value.isoformat() if value else ''}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(value) if value else None), int(id)
+    except ValueError:
+        abort(400, 'Некорректный курсор')
+
+# Функция получения страницы задач по курсору (keyset пагинация)
+# Условие (колонка, id) < (значение, id) использует составной индекс,
+# поэтому любая страница стоит столько же, сколько первая.
+# sort_column=None - сортировка только по id_column
+def fetch_page(query, sort_column=None, cursor=None, limit=PAGE_SIZE, id_column=Todo.id):
+    if sort_column is None:
+        if cursor:
+            query = query.filter(id_column < decode_cursor(cursor)[1])
+        query = query.order_by(id_column.desc())
+    else:
+        if cursor:
+            value, last_id = decode_cursor(cursor)
+            query = query.filter(tuple_(sort_column, id_column) <
+                                 tuple_(literal(value, sort_column.type), literal(last_id)))
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        value = getattr(last, sort_column.key) if sort_column is not None else None
+        next_cursor = encode_cursor(value, last.id)
+    return items, next_cursor
+
+# Функция построения запроса списка задач по статусу или тегу
+# with_tags=False - теги не загружаются (страницы берут их из кэша карточек)
+def task_list_query(status=None, tag=None, with_tags=True):
+    query = Todo.query
+    if with_tags:
+        query = query.options(selectinload(Todo.tag_list))
+    if status:
+        query = query.filter(Todo.status == status)
+    if tag:
+        # Поиск задач по тегу через индекс таблицы связи
+        query = query.join(todo_tag, todo_tag.c.todo_id == Todo.id)\
+                     .join(Tag, Tag.id == todo_tag.c.tag_id)\
+                     .filter(Tag.name == tag)
+    return query
+
+# Функция получения страницы вкладки (или фильтра по тегу)
+# archived - завершенные задачи вместе с архивом
+def get_task_page(status=None, tag=None, cursor=None, limit=PAGE_SIZE, with_tags=True, archived=False):
+    sort_column = TAB_SORT_COLUMNS.get(status) if status else None
+    # Для фильтра по тегу порядок берется из первичного ключа (tag_id, todo_id)
+    # таблицы связи, поэтому сортировка не требуется
+    id_column = todo_tag.c.todo_id if tag and not status else Todo.id
+    page = fetch_page(task_list_query(status, tag, with_tags), sort_column, cursor, limit, id_column)
+    if not archived or status != STATUS_COMPLETED or tag:
+        return page
+    
+    # Страница архива с тем же курсором и слияние двух упорядоченных страниц:
+    # следующая страница есть, если хотя бы в одной из таблиц остались задачи
+    query = ArchivedTodo.query
+    if with_tags:
+        query = query.options(selectinload(ArchivedTodo.tag_list))
+    archived_page = fetch_page(query, ArchivedTodo.completed_at, cursor, limit, ArchivedTodo.id)
+    items = sorted(page[0] + archived_page[0], key=lambda todo: (todo.completed_at, todo.id), reverse=True)
+    next_cursor = None
+    if page[1] or archived_page[1] or len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].completed_at, items[-1].id)
+    return items, next_cursor
+
+# Функция преобразования задачи в словарь для JSON
+def todo_to_dict(todo):
+    def iso(value):
+        return value.isoformat() if value else None
+    return {
+        'id': todo.id,
+        'task': todo.task,
+        'status': todo.status,
+        'tags': [tag.name for tag in todo.tag_list],
+        'created_at': iso(todo.created_at),
+        'started_at': iso(todo.started_at),
+        'completed_at': iso(todo.completed_at),
+        'updated_at': iso(todo.updated_at),
+        'is_edited': bool(todo.is_edited),
+        'archived': todo.archived,
+    }
+
+# Полнотекстовый индекс задач (FTS5 с внешним содержимым из таблицы todo)
+# Синхронизируется триггерами, поэтому любые изменения todo попадают в индекс
+# {table} - таблица задач (todo или todo_archive), индекс называется {table}_fts
+SEARCH_INDEX_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+        task, tags, content='{table}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts (rowid, task, tags) VALUES (new.id, new.task, new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, task, tags) VALUES ('delete', old.id, old.task, old.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF task, tags ON {table} BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, task, tags) VALUES ('delete', old.id, old.task, old.tags);
+        INSERT INTO {table}_fts (rowid, task, tags) VALUES (new.id, new.task, new.tags);
+    END""",
+]
+
+# Функция создания таблицы полнотекстового индекса и триггеров (без заполнения)
+def create_search_triggers(conn, table='todo'):
+    for sql in SEARCH_INDEX_SQL:
+        conn.execute(text(sql.format(table=table)))
+
+# Функция создания и заполнения полнотекстового индекса
+# table='todo_archive' - такой же индекс архива (todo_archive_fts с триггерами)
+def create_search_index(conn, table='todo'):
+    create_search_triggers(conn, table)
+    conn.execute(text(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')"))
+
+# Функция преобразования пользовательского запроса в запрос FTS5
+# Каждое слово ищется как префикс, все слова должны присутствовать
+def build_match_query(query):
+    words = [word.replace('"', '""') for word in query.split()]
+    return ' '.join(f'"{word}"*' for word in words)
+
+# Функция полнотекстового поиска задач, упорядоченных по релевантности (bm25)
+# Текст задачи весит больше, чем теги. archived - искать и в архиве (там только
+# завершенные задачи); id задач и архива не пересекаются
+def search_todos(query, status=None, offset=0, limit=PAGE_SIZE, archived=False):
+    match = build_match_query(query)
+    if not match:
+        return []
+    sql = "SELECT todo_fts.rowid, bm25(todo_fts, 10.0, 5.0) AS rank FROM todo_fts"
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    if status:
+        sql += " JOIN todo ON todo.id = todo_fts.rowid WHERE todo.status = :status AND"
+        params['status'] = status
+    else:
+        sql += " WHERE"
+    sql += " todo_fts MATCH :match"
+    if archived and status in (None, STATUS_COMPLETED):
+        sql += (" UNION ALL SELECT rowid, bm25(todo_archive_fts, 10.0, 5.0) FROM todo_archive_fts"
+                " WHERE todo_archive_fts MATCH :match")
+    sql += " ORDER BY rank LIMIT :limit OFFSET :offset"
+    ids = [row[0] for row in db.session.execute(text(sql), params)]
+    todos = {todo.id: todo for todo in
+             Todo.query.options(selectinload(Todo.tag_list)).filter(Todo.id.in_(ids))}
+    if archived and len(todos) < len(ids):
+        todos.update((todo.id, todo) for todo in ArchivedTodo.query.options(selectinload(ArchivedTodo.tag_list))
+                     .filter(ArchivedTodo.id.in_([id for id in ids if id not in todos])))
+    return [todos[id] for id in ids if id in todos]
+
+# Сводная статистика выполнения задач (таблица daily_rollup)
+# Вклад задачи в статистику определяется ее состоянием: статусом, датами и тегами.
+# Любое изменение задачи - это разница вкладов до и после, поэтому одна функция
+# обслуживает смену статуса, редактирование тегов, удаление и пакеты. Импорт и
+# полный пересчет считают те же вклады одним запросом SQL
+RollupState = namedtuple('RollupState', 'status created_at started_at completed_at tag_ids')
+
+# Даты без часового пояса, как они хранятся в базе
+def naive_datetime(value):
+    return value.replace(tzinfo=None) if value else None
+
+# Функция получения состояния задачи для статистики
+def rollup_state(status, created_at, started_at, completed_at, tag_ids):
+    return RollupState(status, naive_datetime(created_at), naive_datetime(started_at),
+                       naive_datetime(completed_at), tuple(tag_ids))
+
+def todo_rollup_state(todo):
+    return rollup_state(todo.status, todo.created_at, todo.started_at, todo.completed_at,
+                        [tag.id for tag in todo.tag_list])
+
+# Разница в целых секундах - так же, как strftime('%s') в SQLite при пересчете
+def seconds_between(start, end):
+    return int((end.replace(microsecond=0) - start.replace(microsecond=0)).total_seconds())
+
+# Функция вклада задачи: ((tag_id, день), (started, completed, lead, cycle))
+def rollup_contributions(state):
+    if state is None:
+        return
+    groups = (0,) + state.tag_ids
+    if state.status != STATUS_NEW and state.started_at:
+        day = state.started_at.date().isoformat()
+        for tag_id in groups:
+            yield (tag_id, day), (1, 0, 0, 0)
+    if state.status == STATUS_COMPLETED and state.completed_at:
+        day = state.completed_at.date().isoformat()
+        lead = seconds_between(state.created_at, state.completed_at)
+        cycle = seconds_between(state.started_at or state.created_at, state.completed_at)
+        for tag_id in groups:
+            yield (tag_id, day), (0, 1, lead, cycle)
+
+# Функция изменения статистики по списку пар (состояние до, состояние после)
+# None - задачи нет (создана или удалена). Все изменения суммируются и
+# записываются одним пакетным upsert в текущей транзакции
+def adjust_rollups(changes):
+    deltas = {}
+    for before, after in changes:
+        for sign, state in ((-1, before), (1, after)):
+            for key, values in rollup_contributions(state):
+                current = deltas.setdefault(key, [0, 0, 0, 0])
+                for i, value in enumerate(values):
+                    current[i] += sign * value
+    rows = [{'tag_id': tag_id, 'day': day, 'started': values[0], 'completed': values[1],
+             'lead_seconds': values[2], 'cycle_seconds': values[3]}
+            for (tag_id, day), values in sorted(deltas.items()) if any(values)]
+    if not rows:
+        return
+    stmt = sqlite_insert(daily_rollup)
+    columns = ('started', 'completed', 'lead_seconds', 'cycle_seconds')
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[daily_rollup.c.tag_id, daily_rollup.c.day],
+        set_={column: daily_rollup.c[column] + stmt.excluded[column] for column in columns}), rows)
+
+# Статистика по таблицам задач и связей одним проходом (полный пересчет и импорт)
+# {table}/{links} - todo/todo_tag или архив, {where} - дополнительное условие
+# на задачи; суммы добавляются к имеющимся
+ROLLUP_EVENTS_SQL = """
+    SELECT id, date(started_at) AS day, 1 AS started, 0 AS completed, 0 AS lead, 0 AS cycle
+    FROM {table} WHERE status != 'new' AND started_at IS NOT NULL {where}
+    UNION ALL
+    SELECT id, date(completed_at), 0, 1,
+           strftime('%s', completed_at) - strftime('%s', created_at),
+           strftime('%s', completed_at) - strftime('%s', COALESCE(started_at, created_at))
+    FROM {table} WHERE status = 'completed' AND completed_at IS NOT NULL {where}"""
+ROLLUP_UPSERT_SQL = """
+    ON CONFLICT (tag_id, day) DO UPDATE SET started = started + excluded.started,
+        completed = completed + excluded.completed, lead_seconds = lead_seconds + excluded.lead_seconds,
+        cycle_seconds = cycle_seconds + excluded.cycle_seconds"""
+# WHERE true - обязателен в SQLite для upsert из SELECT
+ROLLUP_INSERT_SQL = [
+    f"""INSERT INTO daily_rollup (tag_id, day, started, completed, lead_seconds, cycle_seconds)
+        SELECT 0, day, SUM(started), SUM(completed), SUM(lead), SUM(cycle)
+        FROM ({ROLLUP_EVENTS_SQL}) WHERE true GROUP BY day {ROLLUP_UPSERT_SQL}""",
+    f"""INSERT INTO daily_rollup (tag_id, day, started, completed, lead_seconds, cycle_seconds)
+        SELECT links.tag_id, day, SUM(started), SUM(completed), SUM(lead), SUM(cycle)
+        FROM ({ROLLUP_EVENTS_SQL}) AS events JOIN {{links}} AS links ON links.todo_id = events.id
+        WHERE true GROUP BY links.tag_id, day {ROLLUP_UPSERT_SQL}""",
+]
+
+# Функция добавления в статистику задач, отобранных условием where
+def add_todos_to_rollup(conn, where='', table='todo', links='todo_tag'):
+    for sql in ROLLUP_INSERT_SQL:
+        conn.execute(text(sql.replace('{where}', where).replace('{table}', table).replace('{links}', links)))
+
+# Функция полного пересчета статистики (миграция, seed.py)
+# Архивные задачи остаются в статистике
+def rebuild_daily_rollup(conn):
+    conn.execute(text("DELETE FROM daily_rollup"))
+    add_todos_to_rollup(conn)
+    if table_exists(conn, 'todo_archive'):
+        add_todos_to_rollup(conn, table='todo_archive', links='todo_archive_tag')
+
+# Максимальный период статистики (дней)
+MAX_ANALYTICS_DAYS = 366
+
+# Функция сводки по строкам статистики: среднее время в часах
+def rollup_summary(started, completed, lead_seconds, cycle_seconds, days=None):
+    summary = {
+        'started': started,
+        'completed': completed,
+        'lead_time_hours': round(lead_seconds / completed / 3600, 2) if completed else None,
+        'cycle_time_hours': round(cycle_seconds / completed / 3600, 2) if completed else None,
+    }
+    if days:
+        summary['throughput_per_day'] = round(completed / days, 2)
+    return summary
+
+# Функция статистики за последние days дней: по всем задачам или по тегу
+# Читает не больше days строк (и строки тегов за период при by_tag)
+def get_analytics(days=30, tag_id=0, by_tag=False, tag_limit=20):
+    today = get_moscow_time().date()
+    since = (today - timedelta(days=days - 1)).isoformat()
+    columns = (daily_rollup.c.started, daily_rollup.c.completed,
+               daily_rollup.c.lead_seconds, daily_rollup.c.cycle_seconds)
+    rows = {row[0]: row[1:] for row in db.session.execute(
+        select(daily_rollup.c.day, *columns)
+        .where(daily_rollup.c.tag_id == tag_id, daily_rollup.c.day.between(since, today.isoformat())))}
+
+    # Дни без изменений тоже попадают в ряд - с нулями
+    daily = []
+    for offset in range(days - 1, -1, -1):
+        day = (today - timedelta(days=offset)).isoformat()
+        daily.append({'day': day, **rollup_summary(*rows.get(day, (0, 0, 0, 0)))})
+    totals = [sum(row[i] for row in rows.values()) for i in range(4)]
+    result = {'since': since, 'days': days, 'summary': rollup_summary(*totals, days=days), 'daily': daily}
+
+    if by_tag:
+        sums = [db.func.sum(column) for column in columns]
+        query = (select(Tag.name, *sums).join(Tag, Tag.id == daily_rollup.c.tag_id)
+                 .where(daily_rollup.c.day.between(since, today.isoformat()), daily_rollup.c.tag_id != 0)
+                 .group_by(daily_rollup.c.tag_id).order_by(sums[1].desc(), Tag.name).limit(tag_limit))
+        result['tags'] = [{'tag': name, **rollup_summary(*values, days=days)}
+                          for name, *values in db.session.execute(query)]
+    return result
+
+# Архив завершенных задач
+# Перенос идет пачками по ARCHIVE_BATCH_SIZE, каждая пачка - короткая транзакция
+# под блокировкой записи, поэтому запросы пользователей ждут не дольше одной пачки.
+# Счетчики тегов и статистика по дням не меняются: связи переносятся вместе с задачами
+ARCHIVE_MOVE_SQL = [
+    "INSERT INTO todo_archive ({columns}) SELECT {columns} FROM todo WHERE id IN :ids",
+    "INSERT INTO todo_archive_tag (tag_id, todo_id) SELECT tag_id, todo_id FROM todo_tag WHERE todo_id IN :ids",
+    "DELETE FROM todo_tag WHERE todo_id IN :ids",
+    "DELETE FROM todo WHERE id IN :ids",
+]
+ARCHIVE_RESTORE_SQL = [
+    "INSERT INTO todo ({columns}) SELECT {columns} FROM todo_archive WHERE id IN :ids",
+    "INSERT INTO todo_tag (tag_id, todo_id) SELECT tag_id, todo_id FROM todo_archive_tag WHERE todo_id IN :ids",
+    "DELETE FROM todo_archive_tag WHERE todo_id IN :ids",
+    "DELETE FROM todo_archive WHERE id IN :ids",
+]
+
+def archive_columns():
+    return ', '.join(column.name for column in Todo.__table__.columns)
+
+# Функция переноса в архив задач, завершенных больше older_than_days дней назад
+# pause - пауза между пачками (сек), чтобы фоновая архивация не занимала базу подряд
+def archive_completed_todos(older_than_days, batch_size=None, pause=0.0):
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = (get_moscow_time() - timedelta(days=older_than_days)).replace(tzinfo=None)
+    statements = [text(sql.format(columns=archive_columns())).bindparams(bindparam('ids', expanding=True))
+                  for sql in ARCHIVE_MOVE_SQL]
+    total = 0
+    while True:
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Самые старые завершенные задачи по индексу (status, completed_at, id)
+                ids = conn.execute(
+                    select(Todo.id).where(Todo.status == STATUS_COMPLETED, Todo.completed_at < cutoff)
+                    .order_by(Todo.completed_at, Todo.id).limit(batch_size)).scalars().all()
+                if ids:
+                    for statement in statements:
+                        conn.execute(statement, {'ids': ids})
+                    counters = {STATUS_COMPLETED: -len(ids), STATUS_ARCHIVED: len(ids)}
+                    upsert_task_counts(conn, counters)
+                    # Одно событие на пачку: открытые вкладки получат новые счетчики
+                    conn.execute(change_event.insert().values(payload=json.dumps(
+                        {'type': 'archived', 'id': None, 'status': None, 'counters': counters})))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if not ids:
+            return total
+        total += len(ids)
+        data_version.bump('tasks', 'events')
+        change_feed.wakeup.set()
+        if pause:
+            time.sleep(pause)
+
+# Функция возврата задач из архива в текущей транзакции (то же в обратную сторону)
+# Возвращает id найденных в архиве задач
+def restore_archived_todos(ids):
+    statements = [text(sql.format(columns=archive_columns())).bindparams(bindparam('ids', expanding=True))
+                  for sql in ARCHIVE_RESTORE_SQL]
+    restored = []
+    for chunk in chunked(sorted(ids)):
+        found = db.session.execute(select(ArchivedTodo.id).where(ArchivedTodo.id.in_(chunk))).scalars().all()
+        if found:
+            for statement in statements:
+                db.session.execute(statement, {'ids': found})
+            restored.extend(found)
+    if restored:
+        adjust_task_counts({STATUS_ARCHIVED: -len(restored), STATUS_COMPLETED: len(restored)})
+    return restored
+
+# Функция получения задачи для изменения: архивная задача сначала возвращается в todo
+def get_todo_or_404(id):
+    todo = db.session.get(Todo, id)
+    if todo is None and restore_archived_todos([id]):
+        todo = db.session.get(Todo, id)
+    if todo is None:
+        abort(404)
+    return todo
+
+# Фоновая архивация (ARCHIVE_AFTER_DAYS > 0)
+# Поток запускается при первом запросе в каждом процессе; несколько процессов
+# не мешают друг другу - пачки выбираются под блокировкой записи
+class Archiver:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None or not app.config['ARCHIVE_AFTER_DAYS']:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='archiver', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        interval = app.config['ARCHIVE_INTERVAL']
+        # Случайная задержка - процессы, запущенные вместе, не архивируют одновременно
+        time.sleep(random.uniform(0, min(interval, 60)))
+        while True:
+            try:
+                with app.app_context():
+                    count = archive_completed_todos(app.config['ARCHIVE_AFTER_DAYS'],
+                                                    pause=app.config['ARCHIVE_BATCH_PAUSE'])
+                if count:
+                    logging.info(f"Перенесено в архив задач: {count}")
+            except Exception:
+                logging.exception("Ошибка архивации задач")
+            time.sleep(interval)
+
+archiver = Archiver()
+
+@app.before_request
+def start_archiver():
+    archiver.start()
+
+# Экспорт и импорт задач и тегов (NDJSON или CSV)
+# Колонки экспорта (порядок колонок CSV)
+EXPORT_FIELDS = {
+    'todos': ('id', 'task', 'status', 'tags', 'created_at', 'started_at', 'completed_at', 'updated_at', 'is_edited'),
+    'tags': ('name', 'color', 'usage_count'),
+}
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+# Строк, читаемых из базы за раз (память при экспорте не зависит от размера базы)
+EXPORT_BATCH_SIZE = 5000
+# Размер части ответа при потоковой отдаче (символов)
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Функция чтения записей для экспорта (генератор словарей)
+def export_rows(kind):
+    if kind == 'todos':
+        # Архивные задачи выгружаются вслед за остальными
+        queries = [select(*[table.c[name] for name in EXPORT_FIELDS['todos']]).order_by(table.c.id)
+                   for table in (Todo.__table__, ArchivedTodo.__table__)]
+    else:
+        queries = [select(Tag.name, Tag.color, Tag.usage_count).order_by(Tag.name)]
+    rows = itertools.chain.from_iterable(
+        db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE)) for query in queries)
+    for row in rows:
+        record = row._asdict()
+        if kind == 'todos':
+            # Строка тегов поддерживается вместе с таблицей связи, поэтому join не нужен
+            record['tags'] = parse_tags(record['tags'])
+            record['is_edited'] = bool(record['is_edited'])
+            for name in ('created_at', 'started_at', 'completed_at', 'updated_at'):
+                record[name] = record[name].isoformat() if record[name] else None
+        yield record
+
+# Функция форматирования записей: генератор частей текста NDJSON или CSV
+def format_export(records, kind, fmt):
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS[kind])
+        writer.writeheader()
+    for record in records:
+        if fmt == 'csv':
+            writer.writerow({key: ', '.join(value) if isinstance(value, list) else value
+                             for key, value in record.items()})
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write('\n')
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# Дата в формате экспорта (isoformat с микросекундами)
+ISO_DATE_RE = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}')
+# Триггеры, которые на время импорта заменяются вставкой пачками
+IMPORT_REPLACED_TRIGGERS = ('todo_fts_insert', 'todo_tag_recount_insert')
+# Размер части при копировании тела запроса импорта во временный файл (байт)
+IMPORT_SPOOL_CHUNK = 1024 * 1024
+# Вторичные индексы задач и связей (индексы первичных ключей не затрагиваются)
+IMPORT_DEFERRED_INDEXES_SQL = ("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                               "AND tbl_name IN ('todo', 'todo_tag') AND sql IS NOT NULL")
+
+# Функция чтения записей импорта из текстового потока
+def read_import_records(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f'Строка {number}: {e}')
+
+# Функция разбора даты импорта в формат хранения SQLite
+# Даты из экспорта (isoformat с микросекундами) переносятся без разбора
+def parse_import_date(value):
+    if not value:
+        return None
+    if ISO_DATE_RE.fullmatch(value):
+        return value[:10] + ' ' + value[11:]
+    return datetime.fromisoformat(value).replace(tzinfo=None).isoformat(' ', 'microseconds')
+
+# Функция проверки и преобразования записи задачи в строку для вставки
+def parse_import_todo(record, number, now):
+    try:
+        task = (record.get('task') or '').strip()
+        if not task:
+            raise ValueError('пустой текст задачи')
+        status = record.get('status') or STATUS_NEW
+        if status not in TAB_SORT_COLUMNS:
+            raise ValueError(f'неизвестный статус {status}')
+        tags = record.get('tags')
+        tags = parse_tags(', '.join(tags) if isinstance(tags, list) else tags)
+        created_at = parse_import_date(record.get('created_at')) or now
+        started_at = parse_import_date(record.get('started_at'))
+        completed_at = parse_import_date(record.get('completed_at'))
+        # Пустые даты заполняются так же, как при миграции (нужны для сортировки вкладок)
+        if status != STATUS_NEW and not started_at:
+            started_at = created_at
+        if status == STATUS_COMPLETED and not completed_at:
+            completed_at = started_at
+        is_edited = str(record.get('is_edited', '')).lower() in ('1', 'true')
+        id = int(record['id']) if record.get('id') not in (None, '') else None
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f'Запись {number}: {e}')
+    return id, (task, status, ', '.join(tags), created_at, started_at, completed_at,
+                parse_import_date(record.get('updated_at')), is_edited), tags
+
+# Функция пакетного импорта задач
+# Вся загрузка - одна транзакция под блокировкой записи (BEGIN IMMEDIATE), поэтому
+# id новых задач выдаются подряд после MAX(id) без обратного чтения. Вставка
+# идет пачками через executemany, новые теги создаются одним upsert на пачку.
+# Построчные триггеры вставки (полнотекстовый индекс, очередь пересчета тегов)
+# на время импорта удаляются - в SQLite это часть транзакции, и другие
+# соединения их отсутствия не видят. Индекс поиска пополняется пачками, а
+# счетчики затронутых тегов и задач и статистика по дням записываются один
+# раз в конце.
+# Если импорт не меньше уже имеющихся данных, вторичные индексы тоже удаляются
+# и строятся заново в конце: одна сортировка быстрее построчной вставки.
+# keep_ids - сохранить id из файла
+def import_todos(records, keep_ids=False, batch_size=5000):
+    now = get_moscow_time().replace(tzinfo=None).isoformat(' ', 'microseconds')
+    imported = 0
+    status_counts = Counter()
+    touched_tags = set()
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            triggers = conn.execute(
+                text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN :names")
+                .bindparams(bindparam('names', expanding=True)), {'names': IMPORT_REPLACED_TRIGGERS}).all()
+            for name, _ in triggers:
+                conn.exec_driver_sql(f"DROP TRIGGER {name}")
+            # AUTOINCREMENT: id удаленных и архивных задач больше не выдаются
+            next_id = (conn.exec_driver_sql("SELECT MAX(seq) FROM sqlite_sequence WHERE name = 'todo'").scalar()
+                       or conn.exec_driver_sql("SELECT MAX(id) FROM todo").scalar() or 0) + 1
+            # id загруженных задач - для статистики по дням одним запросом в конце
+            conn.exec_driver_sql("CREATE TEMP TABLE imported_todo (id INTEGER PRIMARY KEY)")
+            existing = conn.exec_driver_sql("SELECT COUNT(*) FROM todo").scalar()
+            tag_ids = dict(conn.exec_driver_sql("SELECT name, id FROM tag").all())
+            deferred_indexes = []
+            for batch in batched(enumerate(records, start=1), batch_size):
+                todos, links, new_tags = [], [], set()
+                for number, record in batch:
+                    id, row, tags = parse_import_todo(record, number, now)
+                    if not keep_ids or id is None:
+                        id = next_id
+                    next_id = max(next_id, id + 1)
+                    todos.append((id,) + row)
+                    status_counts[row[1]] += 1
+                    links.extend((name, id) for name in tags)
+                    new_tags.update(name for name in tags if name not in tag_ids)
+                if new_tags:
+                    conn.exec_driver_sql("INSERT INTO tag (name, color, usage_count) VALUES (?, ?, 0) "
+                                         "ON CONFLICT (name) DO NOTHING",
+                                         [(name, random_color()) for name in new_tags])
+                    for chunk in chunked(list(new_tags)):
+                        tag_ids.update(conn.execute(select(Tag.name, Tag.id).where(Tag.name.in_(chunk))).all())
+                if not deferred_indexes and imported + len(todos) > existing:
+                    deferred_indexes = conn.exec_driver_sql(IMPORT_DEFERRED_INDEXES_SQL).all()
+                    for name, _ in deferred_indexes:
+                        conn.exec_driver_sql(f"DROP INDEX {name}")
+                conn.exec_driver_sql("INSERT INTO todo (id, task, status, tags, created_at, started_at, "
+                                     "completed_at, updated_at, is_edited) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                     todos)
+                conn.exec_driver_sql("INSERT INTO todo_fts (rowid, task, tags) VALUES (?, ?, ?)",
+                                     [todo[:2] + todo[3:4] for todo in todos])
+                if links:
+                    # Связи в порядке первичного ключа (tag_id, todo_id) - вставка в индекс подряд
+                    links = sorted((tag_ids[name], id) for name, id in links)
+                    touched_tags.update(tag_id for tag_id, _ in links)
+                    conn.exec_driver_sql("INSERT INTO todo_tag (tag_id, todo_id) VALUES (?, ?)", links)
+                conn.exec_driver_sql("INSERT INTO temp.imported_todo (id) VALUES (?)",
+                                     [todo[:1] for todo in todos])
+                imported += len(todos)
+            
+            # Счетчики только затронутых тегов
+            recount = text(TAG_USAGE_SQL + " WHERE tag.id IN :ids").bindparams(bindparam('ids', expanding=True))
+            for chunk in chunked(sorted(touched_tags)):
+                conn.execute(recount, {'ids': chunk})
+            for _, sql in deferred_indexes + triggers:
+                conn.exec_driver_sql(sql)
+            if keep_ids:
+                conflict = conn.exec_driver_sql("SELECT id FROM todo_archive WHERE id IN "
+                                                "(SELECT id FROM temp.imported_todo) LIMIT 1").scalar()
+                if conflict is not None:
+                    raise ValueError(f'Задача {conflict} уже есть в архиве')
+            add_todos_to_rollup(conn, "AND id IN (SELECT id FROM temp.imported_todo)")
+            conn.exec_driver_sql("DROP TABLE temp.imported_todo")
+            upsert_task_counts(conn, status_counts)
+            # Одно событие на весь импорт: открытые вкладки получат новые счетчики
+            conn.execute(change_event.insert().values(payload=json.dumps(
+                {'type': 'imported', 'id': None, 'status': None, 'counters': dict(status_counts)})))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    data_version.bump('tasks', 'tags', 'tag_styles', 'events')
+    change_feed.wakeup.set()
+    return imported
+
+# Функция импорта тегов: новые теги создаются, у существующих обновляется цвет
+def import_tags(records):
+    rows = []
+    for number, record in enumerate(records, start=1):
+        name, color = (record.get('name') or '').strip(), record.get('color') or None
+        if not name:
+            raise ValueError(f'Запись {number}: пустое имя тега')
+        rows.append({'name': name, 'color': color or random_color(), 'usage_count': 0})
+    for chunk in chunked(rows):
+        stmt = sqlite_insert(Tag).values(chunk)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=[Tag.name],
+                                                      set_={'color': stmt.excluded.color}))
+    mark_changed('tags', 'tag_styles')
+    db.session.commit()
+    return len(rows)
+
+# Таблица с номером версии схемы БД (одна строка)
+schema_version = db.Table(
+    'schema_version',
+    db.Column('version', db.Integer, nullable=False),
+)
+
+# Миграции структуры БД в порядке применения
+# Номер миграции - ее позиция в списке, поэтому новые добавляются только в конец.
+# Каждая миграция идемпотентна: старые базы без schema_version проходят все шаги
+MIGRATIONS = []
+
+def migration(func):
+    MIGRATIONS.append(func)
+    return func
+
+# Вспомогательные функции для проверки структуры внутри миграций
+def table_exists(conn, name):
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': name}).first() is not None
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")]
+
+def table_indexes(conn, table):
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA index_list({table})")]
+
+@migration
+def create_base_tables(conn):
+    """Создание таблиц задач и тегов"""
+    db.metadata.create_all(conn, tables=[Todo.__table__, Tag.__table__])
+
+@migration
+def upgrade_todo_columns(conn):
+    """Добавление колонок статуса и редактирования, удаление колонки completed"""
+    todo_columns = table_columns(conn, 'todo')
+    required_columns = {
+        'status': "VARCHAR(20) DEFAULT 'new'",
+        'started_at': "DATETIME",
+        'updated_at': "DATETIME",
+        'is_edited': "BOOLEAN DEFAULT FALSE"
+    }
+    for col, col_type in required_columns.items():
+        if col not in todo_columns:
+            conn.execute(text(f"ALTER TABLE todo ADD COLUMN {col} {col_type}"))
+    
+    if 'completed' in todo_columns:
+        # Перенос статусов из старого поля completed перед его удалением
+        if 'status' not in todo_columns:
+            conn.execute(text("UPDATE todo SET status = 'active' WHERE completed = 0"))
+            conn.execute(text("UPDATE todo SET status = 'completed' WHERE completed = 1"))
+        conn.execute(text("ALTER TABLE todo DROP COLUMN completed"))
+
+@migration
+def upgrade_tag_columns(conn):
+    """Добавление колонок цвета и счетчика тегов, индекс по имени"""
+    tag_columns = table_columns(conn, 'tag')
+    required_tag_columns = {
+        'color': "VARCHAR(7) DEFAULT '#6c757d'",
+        'usage_count': "INTEGER DEFAULT 0"
+    }
+    for col, col_type in required_tag_columns.items():
+        if col not in tag_columns:
+            conn.execute(text(f"ALTER TABLE tag ADD COLUMN {col} {col_type}"))
+    if 'idx_tag_name' not in table_indexes(conn, 'tag'):
+        conn.execute(text("CREATE INDEX idx_tag_name ON tag (name)"))
+
+@migration
+def create_todo_tag(conn):
+    """Таблица связи задач и тегов с переносом строковых тегов"""
+    if not table_exists(conn, 'todo_tag'):
+        todo_tag.create(conn)
+        backfill_todo_tags(conn)
+
+@migration
+def create_task_counter(conn):
+    """Таблица счетчиков задач по статусам"""
+    if not table_exists(conn, 'task_counter'):
+        TaskCounter.__table__.create(conn)
+        recount_task_counters(conn)
+
+@migration
+def create_pagination_indexes(conn):
+    """Составные индексы для курсорной пагинации"""
+    # Заполнение пустых дат, чтобы сортировка по ним была полной
+    conn.execute(text("UPDATE todo SET started_at = created_at "
+                      "WHERE started_at IS NULL AND status != 'new'"))
+    conn.execute(text("UPDATE todo SET completed_at = COALESCE(started_at, created_at) "
+                      "WHERE completed_at IS NULL AND status = 'completed'"))
+    todo_indexes = table_indexes(conn, 'todo')
+    for idx in Todo.__table__.indexes:
+        if idx.name not in todo_indexes:
+            idx.create(conn)
+
+@migration
+def create_todo_fts(conn):
+    """Полнотекстовый индекс по тексту и тегам задач"""
+    if not table_exists(conn, 'todo_fts'):
+        create_search_index(conn)
+
+@migration
+def create_tag_recount_queue(conn):
+    """Очередь инкрементального пересчета счетчиков тегов"""
+    tag_recount_queue.create(conn, checkfirst=True)
+    create_tag_recount_triggers(conn)
+
+@migration
+def create_change_event(conn):
+    """Таблица событий изменения задач для потока /api/events"""
+    change_event.create(conn, checkfirst=True)
+
+@migration
+def create_daily_rollup(conn):
+    """Сводная статистика выполнения задач по дням"""
+    daily_rollup.create(conn, checkfirst=True)
+    rebuild_daily_rollup(conn)
+
+@migration
+def create_todo_archive(conn):
+    """Архив завершенных задач, id задач без повторного использования"""
+    # SQLite не меняет AUTOINCREMENT у существующей таблицы, поэтому todo
+    # пересоздается: новая таблица, копирование, замена, индексы и триггеры
+    todo_sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'todo'")).scalar()
+    if 'AUTOINCREMENT' not in todo_sql.upper():
+        columns = archive_columns()
+        conn.execute(CreateTable(Todo.__table__.to_metadata(MetaData(), name='todo_new')))
+        conn.execute(text(f"INSERT INTO todo_new ({columns}) SELECT {columns} FROM todo"))
+        conn.execute(text("DROP TABLE todo"))
+        conn.execute(text("ALTER TABLE todo_new RENAME TO todo"))
+        for idx in Todo.__table__.indexes:
+            idx.create(conn)
+        # Триггеры полнотекстового индекса удалены вместе с таблицей
+        create_search_triggers(conn)
+    ArchivedTodo.__table__.create(conn, checkfirst=True)
+    todo_archive_tag.create(conn, checkfirst=True)
+    if not table_exists(conn, 'todo_archive_fts'):
+        create_search_index(conn, 'todo_archive')
+
+@migration
+def create_tag_usage_index(conn):
+    """Индекс тегов по популярности"""
+    tag_indexes = table_indexes(conn, 'tag')
+    for idx in Tag.__table__.indexes:
+        if idx.name not in tag_indexes:
+            idx.create(conn)
+
+# Функция чтения версии схемы (0 - база без таблицы версий)
+def get_schema_version(conn):
+    if not table_exists(conn, 'schema_version'):
+        return 0
+    return conn.execute(select(schema_version.c.version)).scalar() or 0
+
 # Функция проверки и обновления структуры БД
+# Если схема актуальна - это одно чтение версии. Иначе миграции выполняются
+# под блокировкой записи SQLite (BEGIN IMMEDIATE), поэтому несколько процессов,
+# запущенных одновременно, применяют их ровно один раз
 def check_and_upgrade_db():
     with app.app_context():
-        inspector = db.inspect(db.engine)
-        table_names = inspector.get_table_names()
-        
-        # 1. Проверка и создание отсутствующих таблиц
-        if 'todo' not in table_names or 'tag' not in table_names:
-            db.create_all()
-            print("Созданы отсутствующие таблицы")
-            return
-        
-        # 2. Проверка и удаление устаревшей колонки 'completed'
-        todo_columns = [c['name'] for c in inspector.get_columns('todo')]
-        if 'completed' in todo_columns:
-            print("Обнаружена устаревшая колонка 'completed' - удаление")
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE todo DROP COLUMN completed"))
+        with db.engine.connect() as conn:
+            if get_schema_version(conn) >= len(MIGRATIONS):
+                return
         
-        # 3. Добавление отсутствующих колонок в таблицу todo
-        with db.engine.begin() as conn:
-            # Список необходимых колонок с их типами
-            required_columns = {
-                'status': "VARCHAR(20) DEFAULT 'new'",
-                'started_at': "DATETIME",
-                'updated_at': "DATETIME",
-                'is_edited': "BOOLEAN DEFAULT FALSE"
-            }
-            
-            for col, col_type in required_columns.items():
-                if col not in todo_columns:
-                    print(f"Добавление отсутствующей колонки: {col}")
-                    conn.execute(text(f"ALTER TABLE todo ADD COLUMN {col} {col_type}"))
-            
-            # 4. Миграция данных из старой структуры (если необходимо)
-            if 'status' not in todo_columns:
-                print("Перенос данных из старой структуры")
-                # Обновляем статусы на основе старого поля completed
-                conn.execute(text("UPDATE todo SET status = 'active' WHERE completed = 0"))
-                conn.execute(text("UPDATE todo SET status = 'completed' WHERE completed = 1"))
-        
-        # 5. Проверка индексов для таблицы тегов
-        tag_indexes = [idx['name'] for idx in inspector.get_indexes('tag')]
-        if 'idx_tag_name' not in tag_indexes:
-            print("Создание индекса для тегов")
-            with db.engine.begin() as conn:
-                conn.execute(text("CREATE INDEX idx_tag_name ON tag (name)"))
-        
-        # 6. Проверка колонок таблицы тегов
-        tag_columns = [c['name'] for c in inspector.get_columns('tag')]
-        required_tag_columns = {
-            'color': "VARCHAR(7) DEFAULT '#6c757d'",
-            'usage_count': "INTEGER DEFAULT 0"
-        }
-        
-        with db.engine.begin() as conn:
-            for col, col_type in required_tag_columns.items():
-                if col not in tag_columns:
-                    print(f"Добавление колонки в теги: {col}")
-                    conn.execute(text(f"ALTER TABLE tag ADD COLUMN {col} {col_type}"))
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Версия читается повторно: другой процесс мог успеть обновить схему
+                version = get_schema_version(conn)
+                for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+                    print(f"Миграция {number}: {step.__doc__}")
+                    step(conn)
+                
+                schema_version.create(conn, checkfirst=True)
+                conn.execute(sql_delete(schema_version))
+                conn.execute(schema_version.insert().values(version=max(version, len(MIGRATIONS))))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
         
         print("Проверка структуры БД завершена")
 
 # Главный маршрут - перенаправление на новые задачи    
 @app.route("/")
 def index():
-    # Получаем 10 самых популярных тегов
-    popular_tags = Tag.query.order_by(Tag.usage_count.desc()).limit(10).all()
-    return redirect(url_for("new_tasks", popular_tags=popular_tags))
+    return redirect(url_for("new_tasks"))
     
+# Функция отрисовки вкладки со списком задач
+# archived - завершенные задачи вместе с архивом (?archived=1)
+def render_task_list(active_tab, tag=None, archived=False, **context):
+    def render():
+        cursor = request.args.get('cursor')
+        status = active_tab if active_tab in TAB_SORT_COLUMNS else None
+        todos, next_cursor = get_task_page(status, tag, cursor, with_tags=False, archived=archived)
+        # Получение популярных тегов
+        popular_tags = tag_registry.popular()
+        task_counts = get_task_counts()
+        return render_template("index.html", 
+                             todos=todos, 
+                             cards=render_task_cards(todos),
+                             active_tab=active_tab,
+                             cursor=cursor,
+                             next_cursor=next_cursor,
+                             popular_tags=popular_tags, 
+                             task_counts=task_counts,
+                             archived=archived,
+                             **context)
+    # Страница зависит от задач (список, счетчики) и тегов (популярные, цвета)
+    return conditional_response(('tasks', 'tags'), render)
+
 # Маршрут для работы с новыми задачами
 @app.route("/new", methods=["GET", "POST"])
 def new_tasks():
@@ -147,84 +1840,38 @@ def new_tasks():
         tags = request.form.get("tags", "").strip()
         if task:
             # Создание новой задачи
-            new_todo = Todo(task=task, tags=tags, status='new', created_at=get_moscow_time())
+            new_todo = Todo(task=task, status='new', created_at=get_moscow_time())
             db.session.add(new_todo)
-            
+            adjust_task_counts({STATUS_NEW: 1})
             # Обработка тегов задачи
-            for tag_name in [t.strip() for t in tags.split(',') if t.strip()]:
-                tag = Tag.query.filter_by(name=tag_name).first()
-                if tag:
-                    # Увеличение счетчика существующего тега
-                    tag.usage_count += 1
-                else:
-                    # Создание нового тега
-                    tag = Tag(name=tag_name, usage_count=1, color=random_color())
-                    db.session.add(tag)
-            
+            tag_names = parse_tags(tags)
+            set_todo_tags(new_todo, tag_names)
+            db.session.flush()
+            record_events([task_event('created', new_todo.id, STATUS_NEW, tags=tag_names)])
             db.session.commit()
         
         return redirect(url_for("new_tasks")) # Остаемся на той же вкладке
     
-    # Получение всех новых задач
-    new = Todo.query.filter_by(status='new').order_by(Todo.created_at.desc()).all()
-    # Получение популярных тегов
-    popular_tags = Tag.query.order_by(Tag.usage_count.desc()).limit(10).all()
-    # Создание словаря тегов для быстрого доступа
-    all_tags_dict = {tag.name: tag for tag in Tag.query.all()}
-    task_counts = get_task_counts()
-    return render_template("index.html", 
-                         todos=new, 
-                         active_tab=STATUS_NEW,
-                         popular_tags=popular_tags, 
-                         all_tags_dict=all_tags_dict,
-                         task_counts=task_counts)
+    # Получение страницы новых задач
+    return render_task_list(STATUS_NEW)
 
 # Маршрут для активных задач    
 @app.route("/active", methods=["GET", "POST"])
 def active_tasks():
-    # Получение активных задач
-    active = Todo.query.filter_by(status='active').order_by(Todo.started_at.desc()).all()
-    popular_tags = Tag.query.order_by(Tag.usage_count.desc()).limit(10).all()
-    all_tags_dict = {tag.name: tag for tag in Tag.query.all()}
-    task_counts = get_task_counts()
-    return render_template("index.html", 
-                         todos=active, 
-                         active_tab=STATUS_ACTIVE,
-                         popular_tags=popular_tags, 
-                         all_tags_dict=all_tags_dict,
-                         task_counts=task_counts)
-
-# Маршрут для завершенных задач с пагинацией
+    return render_task_list(STATUS_ACTIVE)
+
+# Маршрут для завершенных задач с пагинацией (?archived=1 - вместе с архивом)
 @app.route("/completed", methods=["GET"])
 def completed_tasks():
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-    
-    # Запрос с пагинацией
-    completed = Todo.query.filter_by(status='completed')\
-                         .order_by(Todo.completed_at.desc())\
-                         .paginate(page=page, per_page=per_page)
-    
-    all_tags_dict = {tag.name: tag for tag in Tag.query.all()}
-    popular_tags = Tag.query.order_by(Tag.usage_count.desc()).limit(10).all()
-    
-    task_counts = get_task_counts()
-    return render_template("index.html", 
-                         todos=completed.items,
-                         pagination=completed,
-                         active_tab=STATUS_COMPLETED,
-                         all_tags_dict=all_tags_dict,
-                         popular_tags=popular_tags,
-                         task_counts=task_counts)
+    return render_task_list(STATUS_COMPLETED, archived=request.args.get('archived') == '1')
 
 # Маршрут для завершения задачи
 @app.route('/complete/<int:id>')
 def complete_task(id):
     todo = Todo.query.get_or_404(id)
-    if todo.status == 'active':
-        # Изменение статуса и установка времени завершения
-        todo.status = 'completed'
-        todo.completed_at = get_moscow_time()
+    # Изменение статуса и установка времени завершения (повторный запрос не пройдет)
+    if todo.status == 'active' and change_status(todo, STATUS_COMPLETED,
+                                                 completed_at=get_moscow_time()):
         db.session.commit()
         return jsonify({
             'status': 'success',
@@ -237,10 +1884,9 @@ def complete_task(id):
 @app.route("/start/<int:id>")
 def start_task(id):
     todo = Todo.query.get_or_404(id)
-    if todo.status == 'new':
-        # Изменение статуса и установка времени начала
-        todo.status = 'active'
-        todo.started_at = get_moscow_time()
+    # Изменение статуса и установка времени начала
+    if todo.status == 'new' and change_status(todo, STATUS_ACTIVE,
+                                              started_at=get_moscow_time()):
         db.session.commit()
         return jsonify({
             'status': 'success',
@@ -251,39 +1897,9 @@ def start_task(id):
 # Маршрут для редактирования задачи
 @app.route("/edit/<int:id>", methods=["POST"])
 def edit_task(id):
+    # Теги и статус читаются под блокировкой: по ним меняются счетчики и статистика
+    begin_write()
     todo = Todo.query.get_or_404(id)
-    # Получение старых тегов
-    old_tags = set(t.strip() for t in todo.tags.split(',') if t.strip()) if todo.tags else set()
-    
-    # Получение новых тегов из формы
-    new_tags_str = request.form.get('tags', '').strip()
-    new_tags = set(t.strip() for t in new_tags_str.split(',') if t.strip())
-    all_tags = {tag.name: tag for tag in Tag.query.all()}
-    
-    # Обновление счетчиков тегов
-    for tag in old_tags - new_tags:
-        if tag in all_tags:
-            db_tag = all_tags[tag]
-            if db_tag.usage_count > 0:
-                db_tag.usage_count -= 1
-            # Удаление тега если он больше не используется
-            if db_tag.usage_count == 0:
-                db.session.delete(db_tag)
-                del all_tags[tag]
-
-    for tag in new_tags - old_tags:
-        if tag in all_tags:
-            # Увеличение счетчика существующего тега
-            db_tag = all_tags[tag]
-            db_tag.usage_count += 1
-        else:
-            # Создание нового тега
-            db_tag = Tag(name=tag, usage_count=1, color=random_color())
-            db.session.add(db_tag)
-            all_tags[tag] = db_tag
-    
-    todo.tags = ','.join(new_tags)
-    db.session.commit()
     
     # Проверка статуса задачи
     if todo.status == 'completed':
@@ -293,26 +1909,30 @@ def edit_task(id):
     if not new_task:
         return jsonify({'status': 'error', 'message': 'Текст задачи не может быть пустым'}), 400
     
+    # Получение старых и новых тегов
+    old_tags = [tag.name for tag in todo.tag_list]
+    new_tags = parse_tags(request.form.get('tags', ''))
+    
     # Обновление задачи если были изменения    
-    if new_task != todo.task or new_tags != old_tags:
+    if new_task != todo.task or set(new_tags) != set(old_tags):
+        before = todo_rollup_state(todo)
         todo.task = new_task
-        todo.tags = new_tags_str
+        # Обновление тегов и их счетчиков
+        set_todo_tags(todo, new_tags)
+        # Статистика взятой в работу задачи переносится на новые теги
+        if set(new_tags) != set(old_tags) and todo.status != STATUS_NEW:
+            db.session.flush()
+            adjust_rollups([(before, todo_rollup_state(todo))])
         now = get_moscow_time()
         todo.updated_at = now
         todo.is_edited = True
-        
-         # Генерация HTML для тегов
-        tags_html = ""
-        if todo.tags:
-            for tag_name in todo.tags.split(','):
-                tag_name = tag_name.strip()
-                if tag_name:
-                    db_tag = Tag.query.filter_by(name=tag_name).first()
-                    color = db_tag.color if db_tag else '#6c757d'
-                    tags_html += f'<a href="{url_for("filter_by_tag", tag=tag_name)}" class="tag-badge me-1 mb-1" style="background-color: {color}; color: white;">{tag_name}</a>'
-        
+        mark_changed('tasks')
+        record_events([task_event('edited', todo.id, todo.status, todo.status, tags=new_tags)])
         db.session.commit()
         
+        # HTML для тегов (тот же фрагмент, что и в карточке задачи)
+        tags_html = render_tag_badges(todo.tag_list)
+        
         return jsonify({
             'status': 'success',
             'counters': get_task_counts(),
@@ -328,21 +1948,18 @@ def edit_task(id):
 # Маршрут для удаления задачи
 @app.route("/delete/<int:id>")
 def delete(id):
-    todo = Todo.query.get_or_404(id)
+    # Статус читается под блокировкой: иначе параллельный /complete успеет
+    # изменить задачу, и вычитаться из счетчиков будет уже не тот статус
+    begin_write()
+    todo = get_todo_or_404(id)
+    adjust_rollups([(todo_rollup_state(todo), None)])
     
     # Уменьшение счетчиков тегов
-    if todo.tags:
-        for tag_name in todo.tags.split(','):
-            tag_name = tag_name.strip()
-            if tag_name:
-                tag = Tag.query.filter_by(name=tag_name).first()
-                if tag:
-                    tag.usage_count -= 1
-                    # Удаление тега если он больше не используется
-                    if tag.usage_count == 0:
-                        db.session.delete(tag)
-    
-    # Удаление задачи
+    set_todo_tags(todo, [])
+    
+    # Удаление задачи (связи с тегами удаляются вместе с ней)
+    adjust_task_counts({todo.status: -1})
+    record_events([task_event('deleted', todo.id, None, todo.status)])
     db.session.delete(todo)
     db.session.commit()
     return jsonify({'status': 'success',
@@ -351,9 +1968,9 @@ def delete(id):
 # Альтернативный маршрут для завершения задачи (для тестирования)
 @app.route("/toggle/<int:id>")
 def toggle(id):
-    todo = Todo.query.get_or_404(id)
-    todo.status = 'completed'
-    todo.completed_at = get_moscow_time()
+    todo = get_todo_or_404(id)
+    if not change_status(todo, STATUS_COMPLETED, completed_at=get_moscow_time()):
+        return jsonify({'status': 'error', 'message': 'Задача изменена другим запросом'}), 409
     db.session.commit()
     return jsonify({'status': 'success'})
 
@@ -362,7 +1979,7 @@ def toggle(id):
 def reactivate_task(id):
     logging.info(f"Получен запрос на возврат задачи {id} в работу")
     try:
-        todo = Todo.query.get_or_404(id)
+        todo = get_todo_or_404(id)  # архивная задача возвращается из архива
         
         # Проверка статуса задачи
         if todo.status != 'completed':
@@ -371,9 +1988,12 @@ def reactivate_task(id):
                 'message': 'Только завершенные задачи можно вернуть в работу'
             }), 400
         
-        # Изменение статуса
-        todo.status = 'active'
-        todo.completed_at = None
+        # Изменение статуса (завершение вычитается из статистики)
+        if not change_status(todo, STATUS_ACTIVE, completed_at=None):
+            return jsonify({
+                'status': 'error',
+                'message': 'Только завершенные задачи можно вернуть в работу'
+            }), 400
         db.session.commit()
         
         return jsonify({
@@ -392,54 +2012,442 @@ def reactivate_task(id):
 # Маршрут для фильтрации задач по тегу        
 @app.route("/filter/<tag>")
 def filter_by_tag(tag):
-    # Поиск задач по тегу
-    tasks = Todo.query.filter(Todo.tags.contains(tag)).all()
-    
-    # Получение популярных тегов
-    popular_tags = Tag.query.order_by(Tag.usage_count.desc()).limit(10).all()
-    # Создание словаря тегов
-    all_tags_dict = {tag.name: tag for tag in Tag.query.all()}
-    task_counts = get_task_counts()
-    return render_template("index.html", 
-                         todos=tasks, 
-                         active_tab='filter',
-                         popular_tags=popular_tags,
-                         all_tags_dict=all_tags_dict,
-                         current_tag=tag,
-                         task_counts=task_counts)
+    return render_task_list('filter', tag=tag, current_tag=tag)
+
+# API для получения страницы задач (курсорная пагинация)
+# status=completed&archived=1 - завершенные вместе с архивом
+@app.route("/api/tasks")
+def api_tasks():
+    status = request.args.get('status', STATUS_NEW)
+    if status not in TAB_SORT_COLUMNS:
+        return jsonify({'status': 'error', 'message': 'Неизвестный статус'}), 400
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    
+    def render():
+        todos, next_cursor = get_task_page(status, request.args.get('tag'), request.args.get('cursor'),
+                                           limit, archived=request.args.get('archived') == '1')
+        return jsonify({
+            'items': [todo_to_dict(todo) for todo in todos],
+            'next_cursor': next_cursor
+        })
+    return conditional_response(('tasks',), render)
+
+# Максимальное количество операций в одном пакете
+MAX_BATCH_SIZE = 10000
+
+# Допустимые переходы статусов для пакетных операций: операция -> (из статуса, в статус)
+BATCH_TRANSITIONS = {
+    'start': (STATUS_NEW, STATUS_ACTIVE),
+    'complete': (STATUS_ACTIVE, STATUS_COMPLETED),
+    'reactivate': (STATUS_COMPLETED, STATUS_ACTIVE),
+}
+
+# id задачи в JSON - целое число (bool в Python тоже int, но id не является)
+def is_task_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+# Функция применения пакета операций в текущей транзакции
+# Операции сначала проверяются по состоянию в памяти (в порядке следования),
+# затем изменения применяются групповыми UPDATE/DELETE и одной корректировкой тегов
+def apply_batch(operations):
+    now = get_moscow_time()
+    ids = {op.get('id') for op in operations if is_task_id(op.get('id'))}
+    # Архивные задачи, которые возвращают в работу или удаляют, сначала
+    # возвращаются из архива (остальные операции к завершенным неприменимы)
+    restore_archived_todos({op['id'] for op in operations
+                            if op.get('op') in ('reactivate', 'delete') and is_task_id(op.get('id'))})
+    
+    # Исходное состояние задач и их тегов - два запроса на весь пакет
+    original_rows = {}
+    original_tags = {}
+    original_tag_ids = {}
+    for chunk in chunked(list(ids)):
+        for row in db.session.execute(
+                select(Todo.id, Todo.status, Todo.created_at, Todo.started_at, Todo.completed_at)
+                .where(Todo.id.in_(chunk))):
+            original_rows[row.id] = row
+        for todo_id, tag_id, name in db.session.execute(
+                select(todo_tag.c.todo_id, Tag.id, Tag.name).join(Tag, Tag.id == todo_tag.c.tag_id)
+                .where(todo_tag.c.todo_id.in_(chunk))):
+            original_tags.setdefault(todo_id, []).append(name)
+            original_tag_ids.setdefault(todo_id, []).append(tag_id)
+    original_status = {todo_id: row.status for todo_id, row in original_rows.items()}
+    
+    status = dict(original_status)  # None - задача удалена
+    fields = {}  # id -> изменяемые колонки
+    tags = {}  # id -> новый список тегов
+    results = []
+    for op in operations:
+        name, todo_id = op.get('op'), op.get('id')
+        result = {'op': name, 'id': todo_id, 'status': 'success'}
+        results.append(result)
+        if not isinstance(name, str):
+            result.update(status='error', message='Неизвестная операция')
+        elif not is_task_id(todo_id) or status.get(todo_id) is None:
+            result.update(status='error', message='Задача не найдена')
+        elif name in BATCH_TRANSITIONS:
+            source, target = BATCH_TRANSITIONS[name]
+            if status[todo_id] != source:
+                result.update(status='error', message=f'Недопустимый переход из статуса {status[todo_id]}')
+                continue
+            status[todo_id] = target
+            changes = fields.setdefault(todo_id, {})
+            changes['status'] = target
+            if name == 'start':
+                changes['started_at'] = now
+            elif name == 'complete':
+                changes['completed_at'] = now
+            else:
+                changes['completed_at'] = None
+        elif name == 'retag':
+            if status[todo_id] == STATUS_COMPLETED:
+                result.update(status='error', message='Нельзя редактировать завершенную задачу')
+                continue
+            new_tags = op.get('tags', '')
+            # Теги - строка через запятую или список строк
+            if isinstance(new_tags, list) and all(isinstance(tag, str) for tag in new_tags):
+                new_tags = ', '.join(new_tags)
+            if not isinstance(new_tags, str):
+                result.update(status='error', message='Теги должны быть строкой или списком строк')
+                continue
+            tags[todo_id] = parse_tags(new_tags)
+        elif name == 'delete':
+            status[todo_id] = None
+        else:
+            result.update(status='error', message='Неизвестная операция')
+    
+    deleted = [todo_id for todo_id in original_status if status[todo_id] is None]
+    retagged = [todo_id for todo_id in tags if status[todo_id] is not None]
+    
+    # Счетчики задач и тегов - одна агрегированная корректировка
+    status_deltas = Counter()
+    tag_deltas = Counter()
+    for todo_id in original_status:
+        if status[todo_id] != original_status[todo_id]:
+            status_deltas[original_status[todo_id]] -= 1
+            if status[todo_id] is not None:
+                status_deltas[status[todo_id]] += 1
+    for todo_id in deleted + retagged:
+        tag_deltas.subtract(original_tags.get(todo_id, []))
+    for todo_id in retagged:
+        tag_deltas.update(tags[todo_id])
+    
+    # Удаление задач и связей с тегами
+    for chunk in chunked(deleted + retagged):
+        db.session.execute(sql_delete(todo_tag).where(todo_tag.c.todo_id.in_(chunk)))
+    for chunk in chunked(deleted):
+        db.session.execute(sql_delete(Todo.__table__).where(Todo.__table__.c.id.in_(chunk)))
+    
+    # Смена статусов - один UPDATE на каждую группу одинаковых изменений
+    groups = {}
+    for todo_id, changes in fields.items():
+        if status[todo_id] is not None:
+            groups.setdefault(tuple(sorted(changes.items())), []).append(todo_id)
+    for changes, group_ids in groups.items():
+        for chunk in chunked(group_ids):
+            db.session.execute(update(Todo.__table__)
+                               .where(Todo.__table__.c.id.in_(chunk)).values(dict(changes)))
+    
+    # Новые теги и связи
+    tag_objects = apply_tag_deltas(tag_deltas)
+    missing = {name for todo_id in retagged for name in tags[todo_id]} - set(tag_objects)
+    if missing:
+        tag_objects.update((tag.name, tag) for tag in Tag.query.filter(Tag.name.in_(missing)))
+    db.session.flush()
+    if retagged:
+        db.session.execute(
+            update(Todo.__table__).where(Todo.__table__.c.id == bindparam('todo_id'))
+            .values(tags=bindparam('new_tags'), updated_at=now, is_edited=True),
+            [{'todo_id': todo_id, 'new_tags': ', '.join(tags[todo_id])} for todo_id in retagged])
+        links = [{'tag_id': tag_objects[name].id, 'todo_id': todo_id}
+                 for todo_id in retagged for name in tags[todo_id]]
+        if links:
+            db.session.execute(todo_tag.insert(), links)
+    
+    adjust_task_counts(status_deltas)
+    
+    # Статистика по дням - по состояниям задач до и после пакета
+    def state(row, changes, tag_ids):
+        values = {'status': row.status, 'started_at': row.started_at,
+                  'completed_at': row.completed_at, **changes}
+        return rollup_state(values['status'], row.created_at, values['started_at'],
+                            values['completed_at'], tag_ids)
+    rollup_changes = []
+    for todo_id, row in original_rows.items():
+        if todo_id not in fields and todo_id not in tags and status[todo_id] is not None:
+            continue
+        before = state(row, {}, original_tag_ids.get(todo_id, []))
+        after = None
+        if status[todo_id] is not None:
+            tag_ids = ([tag_objects[name].id for name in tags[todo_id]] if todo_id in tags
+                       else original_tag_ids.get(todo_id, []))
+            after = state(row, fields.get(todo_id, {}), tag_ids)
+        rollup_changes.append((before, after))
+    adjust_rollups(rollup_changes)
+    
+    # События для потока /api/events
+    events = []
+    for todo_id in original_status:
+        if status[todo_id] != original_status[todo_id]:
+            events.append(task_event('deleted' if status[todo_id] is None else 'status',
+                                     todo_id, status[todo_id], original_status[todo_id]))
+    events.extend(task_event('edited', todo_id, status[todo_id], status[todo_id], tags=tags[todo_id])
+                  for todo_id in retagged)
+    record_events(events)
+    return results
+
+# HTML карточки задачи (для вставки на страницу по событиям /api/events)
+@app.route("/api/tasks/<int:id>/card")
+def task_card(id):
+    todo = db.session.get(Todo, id) or db.session.get(ArchivedTodo, id)
+    if todo is None:
+        abort(404)
+    return render_task_cards([todo])[0]
+
+# Поток событий изменения задач и счетчиков (Server-Sent Events)
+# После разрыва браузер переподключается с заголовком Last-Event-ID и получает
+# пропущенные события; если их уже нет в буфере - событие reset
+@app.route("/api/events")
+def api_events():
+    heartbeat = app.config['SSE_HEARTBEAT_SECONDS']
+    if not sse_slots.acquire(blocking=False):
+        response = app.response_class(f'retry: {heartbeat * 1000}\n\n', status=503,
+                                      mimetype='text/event-stream')
+        response.headers['Retry-After'] = str(heartbeat)
+        return response
+    change_feed.start()
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None or last_id > change_feed.last_id:
+        last_id = change_feed.last_id
+    # Соединение закрывается через SSE_MAX_SECONDS, браузер сразу переподключается
+    deadline = time.monotonic() + app.config['SSE_MAX_SECONDS']
+    
+    def stream(position):
+        yield f'retry: {app.config["SSE_RETRY_MS"]}\n\n'
+        counters = change_feed.counters
+        yield sse_message(counters, event='counters')
+        while time.monotonic() < deadline:
+            # Ожидание не дольше оставшегося до закрытия соединения времени
+            timeout = max(min(heartbeat, deadline - time.monotonic()), 0)
+            position, events, new_counters = change_feed.wait(position, timeout)
+            if events is None:
+                yield sse_message({}, event='reset', id=position)
+                return
+            for event_id, payload in events:
+                yield sse_message(payload, event='task', id=event_id)
+            if new_counters != counters:
+                counters = new_counters
+                yield sse_message(counters, event='counters')
+            if not events:
+                # Комментарий не дает прокси закрыть простаивающее соединение
+                yield ': ping\n\n'
+    
+    response = app.response_class(stream(last_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Место освобождается, когда сервер закрывает ответ (и при разрыве соединения)
+    response.call_on_close(sse_slots.release)
+    return response
+
+# API пакетного изменения задач: все операции в одной транзакции
+@app.route("/api/tasks/batch", methods=["POST"])
+def batch_tasks():
+    payload = request.get_json(silent=True)
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        return jsonify({'status': 'error', 'message': 'Ожидается список операций'}), 400
+    if len(operations) > MAX_BATCH_SIZE:
+        return jsonify({'status': 'error', 'message': f'Не более {MAX_BATCH_SIZE} операций за раз'}), 400
+    
+    try:
+        # Исходные статусы читаются под блокировкой записи: иначе параллельный
+        # /complete той же задачи успеет изменить ее между чтением и групповым UPDATE
+        begin_write()
+        results = apply_batch(operations)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.exception("Ошибка пакетной операции")
+        return jsonify({'status': 'error', 'message': f'Ошибка сервера: {str(e)}'}), 500
+    
+    return jsonify({
+        'status': 'success',
+        'results': results,
+        'counters': get_task_counts()
+    })
+
+# Потоковый экспорт задач или тегов: /api/export/todos?format=ndjson|csv
+@app.route("/api/export/<kind>")
+def export_data(kind):
+    fmt = request.args.get('format', 'ndjson')
+    if kind not in EXPORT_FIELDS or fmt not in EXPORT_FORMATS:
+        return jsonify({'status': 'error', 'message': 'Неизвестный тип или формат экспорта'}), 400
+    body = stream_with_context(format_export(export_rows(kind), kind, fmt))
+    response = app.response_class(body, mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{fmt}'
+    return response
+
+# Импорт задач или тегов из тела запроса (NDJSON или CSV)
+# /api/import/todos?format=csv&keep_ids=1
+@app.route("/api/import/<kind>", methods=["POST"])
+def import_data(kind):
+    fmt = request.args.get('format', 'ndjson')
+    if kind not in EXPORT_FIELDS or fmt not in EXPORT_FORMATS:
+        return jsonify({'status': 'error', 'message': 'Неизвестный тип или формат импорта'}), 400
+    # Тело запроса сначала целиком копируется во временный файл: импорт держит
+    # блокировку записи, и медленная загрузка не должна блокировать всю базу
+    with tempfile.TemporaryFile() as body:
+        shutil.copyfileobj(request.stream, body, IMPORT_SPOOL_CHUNK)
+        body.seek(0)
+        records = read_import_records(io.TextIOWrapper(body, encoding='utf-8', newline=''), fmt)
+        try:
+            if kind == 'todos':
+                count = import_todos(records, keep_ids=request.args.get('keep_ids') == '1')
+            else:
+                count = import_tags(records)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except IntegrityError as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': f'Конфликт данных: {e.orig}'}), 409
+    return jsonify({'status': 'success', 'imported': count, 'counters': get_task_counts()})
+
+# API полнотекстового поиска задач с постраничной выдачей (archived=1 - и в архиве)
+@app.route("/api/search")
+def api_search():
+    query = request.args.get('q', '').strip()
+    status = request.args.get('status')
+    if status and status not in TAB_SORT_COLUMNS:
+        return jsonify({'status': 'error', 'message': 'Неизвестный статус'}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    
+    def render():
+        # Запрашиваем на одну запись больше, чтобы узнать о следующей странице
+        todos = search_todos(query, status, (page - 1) * limit, limit + 1,
+                             archived=request.args.get('archived') == '1')
+        return jsonify({
+            'items': [todo_to_dict(todo) for todo in todos[:limit]],
+            'page': page,
+            'next_page': page + 1 if len(todos) > limit else None
+        })
+    return conditional_response(('tasks',), render)
+
+# API статистики выполнения задач: /api/analytics?days=30&tag=работа&by_tag=1
+# Время выполнения (lead - от создания, cycle - от начала работы) и количество
+# завершенных задач по дням за последние days дней, по всем задачам или по тегу
+@app.route("/api/analytics")
+def api_analytics():
+    days = min(max(request.args.get('days', 30, type=int), 1), MAX_ANALYTICS_DAYS)
+    tag = request.args.get('tag', '').strip()
+    by_tag = request.args.get('by_tag') == '1'
+    
+    def render():
+        tag_id = 0
+        if tag:
+            tag_id = db.session.execute(select(Tag.id).where(Tag.name == tag)).scalar()
+            if tag_id is None:
+                return jsonify({'status': 'error', 'message': 'Тег не найден'}), 404
+        return jsonify({'tag': tag or None, **get_analytics(days, tag_id, by_tag)})
+    # Период отсчитывается от сегодняшнего дня, поэтому дата входит в ETag
+    return conditional_response(('tasks',), render, extra=(get_moscow_time().date(),))
 
 # API для получения тегов (для автодополнения)    
 @app.route("/api/tags")
 def get_tags():
-    search = request.args.get('search', '')
-    # Поиск тегов по подстроке
-    tags = Tag.query.filter(Tag.name.ilike(f'%{search}%')).order_by(Tag.usage_count.desc()).limit(10).all()
-    return jsonify([tag.name for tag in tags])
+    search = request.args.get('search', '').strip()
+    mode = request.args.get('mode', 'prefix')
+    if mode not in ('prefix', 'substring'):
+        return jsonify({'status': 'error', 'message': 'Неизвестный режим поиска'}), 400
+    
+    # Ответ зависит только от версии тегов и параметров запроса
+    def render():
+        if not search:
+            return jsonify([tag.name for tag in tag_registry.popular()])
+        _, index = tag_registry.search_index()
+        return jsonify(index.prefix(search) if mode == 'prefix' else index.substring(search))
+    return conditional_response(('tags',), render, max_age=10)
+
+# Метрики приложения в формате Prometheus
+@app.route("/metrics")
+def metrics_endpoint():
+    return app.response_class(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
 
 # Маршрут для обновления счетчиков тегов
+# mode=incremental - только теги, связи которых менялись после прошлого пересчета
 @app.route("/refresh-tags")
 def refresh_tags():
-    # Пересчет счетчиков тегов
-    all_tags_dict = {tag.name: tag for tag in Tag.query.all()}
-    tag_names = {tag.name for tag in all_tags_dict}
-    
-    # Сброс счетчиков
-    for tag in all_tags_dict:
-        tag.usage_count = 0
-    
-    ## Пересчет использования тегов
-    todos = Todo.query.all()
-    for todo in todos:
-        if todo.tags:
-            for tag_name in todo.tags.split(','):
-                tag_name = tag_name.strip()
-                if tag_name in tag_names:
-                    tag = next((t for t in all_tags_dict if t.name == tag_name), None)
-                    if tag:
-                        tag.usage_count += 1
-    
-    db.session.commit()
-    return jsonify({'status': 'success'})
+    incremental = request.args.get('mode', 'full') == 'incremental'
+    count = recount_tags(incremental=incremental)
+    return jsonify({'status': 'success', 'recounted': count})
+
+# Команда для пересчета счетчиков тегов: flask recount-tags [--incremental]
+@app.cli.command('recount-tags')
+@click.option('--incremental', is_flag=True, help='Пересчитать только измененные теги')
+def recount_tags_command(incremental):
+    count = recount_tags(incremental=incremental)
+    print(f"Пересчитано тегов: {count}")
+
+# Команда пересчета счетчиков задач по статусам: flask recount-tasks
+@app.cli.command('recount-tasks')
+def recount_tasks_command():
+    with db.engine.begin() as conn:
+        recount_task_counters(conn)
+    data_version.bump('tasks')
+    for status, count in get_task_counts().items():
+        print(f"{status}: {count}")
+
+# Команда полного пересчета статистики по дням: flask rebuild-analytics
+@app.cli.command('rebuild-analytics')
+def rebuild_analytics_command():
+    with db.engine.begin() as conn:
+        rebuild_daily_rollup(conn)
+    data_version.bump('tasks')
+    print("Статистика пересчитана")
+
+# Команда переноса старых завершенных задач в архив: flask archive-tasks --older-than 90
+@app.cli.command('archive-tasks')
+@click.option('--older-than', type=int, default=lambda: app.config['ARCHIVE_AFTER_DAYS'] or 90,
+              show_default='ARCHIVE_AFTER_DAYS или 90', help='Дней после завершения')
+@click.option('--batch-size', type=int, help='Задач в одной транзакции (ARCHIVE_BATCH_SIZE)')
+def archive_tasks_command(older_than, batch_size):
+    started = time.perf_counter()
+    count = archive_completed_todos(older_than, batch_size)
+    print(f"Перенесено в архив задач: {count} за {time.perf_counter() - started:.1f} с")
+
+# Команда экспорта: flask export-data todos --format csv --output todos.csv
+@app.cli.command('export-data')
+@click.argument('kind', type=click.Choice(list(EXPORT_FIELDS)))
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Файл (по умолчанию stdout)')
+def export_data_command(kind, fmt, output):
+    f = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+    try:
+        for chunk in format_export(export_rows(kind), kind, fmt):
+            f.write(chunk)
+    finally:
+        if output:
+            f.close()
+
+# Команда импорта: flask import-data todos todos.csv [--keep-ids]
+# Формат определяется по расширению файла (.csv или NDJSON)
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(list(EXPORT_FIELDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--keep-ids', is_flag=True, help='Сохранить id задач из файла')
+def import_data_command(kind, path, keep_ids):
+    fmt = 'csv' if path.endswith('.csv') else 'ndjson'
+    # Импорт возможен и в новый файл базы - структура создается миграциями
+    check_and_upgrade_db()
+    started = time.perf_counter()
+    with open(path, encoding='utf-8', newline='') as f:
+        records = read_import_records(f, fmt)
+        try:
+            count = import_todos(records, keep_ids=keep_ids) if kind == 'todos' else import_tags(records)
+        except (ValueError, IntegrityError) as e:
+            raise click.ClickException(str(e))
+    print(f"Импортировано записей: {count} за {time.perf_counter() - started:.1f} с")
 
 # Фильтр для форматирования дат в шаблонах
 @app.template_filter('format_date')
@@ -453,5 +2461,6 @@ if __name__ == "__main__":
     with app.app_context():
         # Проверка и обновление структуры БД
         check_and_upgrade_db()
-     # Запуск Flask приложения
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Запуск встроенного сервера Flask (для разработки)
+    # В production используйте wsgi.py: gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(host="0.0.0.0", port=5000, debug=app.config['DEBUG'])
\ No newline at end of file
@@ -0,0 +1,220 @@
+# Бенчмарк маршрутов приложения с отчетом в JSON
+#
+# Через тестовый клиент Flask (база копируется во временный файл, исходная
+# не изменяется):
+#     python bench.py --db /tmp/todos-bench.db --requests 200 --output before.json
+# Через запущенный сервер (id задач берутся из той же базы, что у сервера):
+#     python bench.py --db todos.db --url http://127.0.0.1:5000 --concurrency 8
+# Сравнение с предыдущим запуском:
+#     python bench.py --db /tmp/todos-bench.db --compare before.json
+#
+# Для каждого маршрута в отчете - p50/p95/p99 и среднее время ответа (мс),
+# пропускная способность (запросов в секунду) и количество ошибок
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Транспорт через тестовый клиент Flask (отдельный клиент на поток)
+class TestClientTransport:
+    def __init__(self, db_path):
+        os.environ['DATABASE_PATH'] = db_path
+        from app import app, check_and_upgrade_db
+        check_and_upgrade_db()
+        app.config['PROPAGATE_EXCEPTIONS'] = False
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, data=None):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data()
+
+# Транспорт через HTTP к запущенному серверу
+class HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+# Функция выборки случайных id задач с заданным статусом
+def sample_ids(conn, status, count, rng):
+    ids = [row[0] for row in conn.execute("SELECT id FROM todo WHERE status = ?", (status,))]
+    return rng.sample(ids, min(count, len(ids)))
+
+# Функция получения курсора страницы с заданным номером (для глубоких страниц)
+def deep_cursor(transport, status, page):
+    cursor = None
+    for _ in range(page - 1):
+        query = urllib.parse.urlencode({'status': status, **({'cursor': cursor} if cursor else {})})
+        code, body = transport.request('GET', f'/api/tasks?{query}')
+        cursor = json.loads(body).get('next_cursor') if code == 200 else None
+        if not cursor:
+            break
+    return cursor
+
+# Функция построения сценариев: имя -> список запросов (метод, путь, данные)
+def build_scenarios(conn, transport, args, rng):
+    n = args.requests
+    popular = [row[0] for row in conn.execute("SELECT name FROM tag ORDER BY usage_count DESC LIMIT 20")]
+    rare = [row[0] for row in conn.execute("SELECT name FROM tag ORDER BY usage_count ASC LIMIT 20")]
+    new_ids = sample_ids(conn, 'new', n, rng)
+    active_ids = sample_ids(conn, 'active', 2 * n, rng)
+    any_ids = [row[0] for row in conn.execute("SELECT id FROM todo ORDER BY id DESC LIMIT ?", (n,))]
+    prefixes = [name[:k] for name in popular for k in (1, 2, 3)] or ['t']
+    cursor = deep_cursor(transport, 'completed', args.deep_page)
+
+    def repeat(make):
+        return [make(i) for i in range(n)]
+
+    scenarios = {
+        'new': repeat(lambda i: ('GET', '/new', None)),
+        'active': repeat(lambda i: ('GET', '/active', None)),
+        'completed': repeat(lambda i: ('GET', '/completed', None)),
+        f'completed_page_{args.deep_page}': repeat(
+            lambda i: ('GET', '/completed' + (f'?cursor={cursor}' if cursor else ''), None)),
+        'filter_popular': repeat(lambda i: ('GET', '/filter/' + urllib.parse.quote(rng.choice(popular or ['x'])), None)),
+        'filter_rare': repeat(lambda i: ('GET', '/filter/' + urllib.parse.quote(rng.choice(rare or ['x'])), None)),
+        'api_tags': repeat(lambda i: ('GET', '/api/tags?search=' + urllib.parse.quote(rng.choice(prefixes)), None)),
+        # Изменяющие маршруты - каждому запросу своя задача
+        'edit': [('POST', f'/edit/{id}', {'task': f'Отредактировано {id}', 'tags': rng.choice(popular or [''])})
+                 for id in active_ids[:n]],
+        'start': [('GET', f'/start/{id}', None) for id in new_ids],
+        'complete': [('GET', f'/complete/{id}', None) for id in active_ids[n:]],
+        'delete': [('GET', f'/delete/{id}', None) for id in any_ids],
+    }
+    if args.routes:
+        scenarios = {name: requests for name, requests in scenarios.items() if name in args.routes}
+    return scenarios
+
+# Функция прогона одного сценария
+def run_scenario(transport, requests, concurrency):
+    latencies = []
+    errors = 0
+
+    def send(request):
+        method, path, data = request
+        started = time.perf_counter()
+        code, _ = transport.request(method, path, data)
+        return (time.perf_counter() - started) * 1000, code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, code in pool.map(send, requests):
+            latencies.append(latency)
+            if code >= 400:
+                errors += 1
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed)
+
+def summarize(latencies, errors, elapsed):
+    if not latencies:
+        return {'count': 0}
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+# Функция сравнения с предыдущим отчетом: отношение новых значений к старым
+def compare(report, baseline):
+    result = {}
+    for name, stats in report['routes'].items():
+        old = baseline.get('routes', {}).get(name)
+        if not old or not stats.get('count') or not old.get('count'):
+            continue
+        result[name] = {key: round(stats[key] / old[key], 2) if old[key] else None
+                        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps')}
+    return result
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)), text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк маршрутов приложения')
+    parser.add_argument('--db', required=True, help='База данных (например, заполненная seed.py)')
+    parser.add_argument('--url', help='Адрес запущенного сервера (по умолчанию - тестовый клиент Flask)')
+    parser.add_argument('--in-place', action='store_true', help='Не копировать базу для тестового клиента')
+    parser.add_argument('--requests', type=int, default=200, help='Запросов на маршрут')
+    parser.add_argument('--concurrency', type=int, default=1, help='Параллельных запросов')
+    parser.add_argument('--deep-page', type=int, default=50, help='Номер глубокой страницы завершенных задач')
+    parser.add_argument('--routes', nargs='+', help='Запустить только эти сценарии')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел')
+    parser.add_argument('--output', help='Файл для JSON отчета (по умолчанию stdout)')
+    parser.add_argument('--compare', help='Предыдущий JSON отчет для сравнения')
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db)
+    temp_dir = None
+    if args.url:
+        transport = HttpTransport(args.url)
+    else:
+        if not args.in_place:
+            temp_dir = tempfile.mkdtemp(prefix='todo-bench-')
+            shutil.copy(db_path, os.path.join(temp_dir, 'todos.db'))
+            db_path = os.path.join(temp_dir, 'todos.db')
+        transport = TestClientTransport(db_path)
+
+    rng = random.Random(args.seed)
+    conn = sqlite3.connect(db_path)
+    scenarios = build_scenarios(conn, transport, args, rng)
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'transport': 'http' if args.url else 'test_client',
+            'todos': conn.execute("SELECT COUNT(*) FROM todo").fetchone()[0],
+            'tags': conn.execute("SELECT COUNT(*) FROM tag").fetchone()[0],
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'routes': {},
+    }
+    conn.close()
+
+    for name, requests in scenarios.items():
+        report['routes'][name] = run_scenario(transport, requests, args.concurrency)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['comparison'] = compare(report, json.load(f))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    if temp_dir:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Нагрузочное сравнение профилей SQLite при конкурентных чтениях и записях
+#
+# Для каждого профиля (development - настройки SQLite по умолчанию,
+# production - WAL и PRAGMA из config.py) создается временная копия базы,
+# затем несколько процессов с несколькими потоками в течение заданного времени
+# читают /active и создают задачи через POST /new.
+#
+# Запуск:
+#     python bench_concurrency.py --processes 4 --threads 4 --duration 10
+# Результат - JSON с пропускной способностью чтений/записей и числом ошибок
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+PROFILES = ('development', 'production')
+
+# Функция подготовки временной базы для профиля
+def prepare_database(profile, source, seed):
+    directory = tempfile.mkdtemp(prefix=f'todo-bench-{profile}-')
+    path = os.path.join(directory, 'todos.db')
+    if source and os.path.exists(source):
+        shutil.copy(source, path)
+    os.environ['APP_ENV'] = profile
+    os.environ['DATABASE_PATH'] = path
+    from app import app, db, check_and_upgrade_db, change_status, Todo, STATUS_NEW, STATUS_ACTIVE
+    check_and_upgrade_db()
+    client = app.test_client()
+    for i in range(seed):
+        client.post('/new', data={'task': f'Задача {i}', 'tags': f'bench, tag{i % 50}'})
+    # Все созданные задачи переводятся в работу, чтобы /active было что читать
+    with app.app_context():
+        for todo in Todo.query.filter_by(status=STATUS_NEW):
+            change_status(todo, STATUS_ACTIVE)
+            todo.started_at = todo.created_at
+        db.session.commit()
+    return path
+
+# Рабочий процесс: потоки выполняют запросы до истечения времени
+def run_worker(profile, path, threads, duration, write_ratio, results):
+    os.environ['APP_ENV'] = profile
+    os.environ['DATABASE_PATH'] = path
+    from app import app
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    deadline = time.perf_counter() + duration
+    stats = {'reads': 0, 'writes': 0, 'errors': 0, 'locked': 0}
+    lock = threading.Lock()
+
+    def loop():
+        client = app.test_client()
+        local = {'reads': 0, 'writes': 0, 'errors': 0, 'locked': 0}
+        while time.perf_counter() < deadline:
+            is_write = random.random() < write_ratio
+            try:
+                if is_write:
+                    response = client.post('/new', data={'task': 'bench write', 'tags': 'bench'})
+                else:
+                    response = client.get('/active')
+                if response.status_code >= 500:
+                    local['errors'] += 1
+                    if b'locked' in response.data:
+                        local['locked'] += 1
+                else:
+                    local['writes' if is_write else 'reads'] += 1
+            except Exception as e:
+                local['errors'] += 1
+                if 'locked' in str(e):
+                    local['locked'] += 1
+        with lock:
+            for key, value in local.items():
+                stats[key] += value
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put(stats)
+
+# Функция запуска нагрузки для одного профиля
+def bench_profile(profile, args):
+    context = multiprocessing.get_context('spawn')
+    # Подготовка базы в отдельном процессе, чтобы профиль применился при импорте app
+    with context.Pool(1) as pool:
+        path = pool.apply(prepare_database, (profile, args.source, args.seed))
+
+    results = context.Queue()
+    processes = [context.Process(target=run_worker,
+                                 args=(profile, path, args.threads, args.duration, args.write_ratio, results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    totals = {'reads': 0, 'writes': 0, 'errors': 0, 'locked': 0}
+    for _ in processes:
+        for key, value in results.get().items():
+            totals[key] += value
+    for process in processes:
+        process.join()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    return {
+        'reads_per_sec': round(totals['reads'] / args.duration, 1),
+        'writes_per_sec': round(totals['writes'] / args.duration, 1),
+        'errors': totals['errors'],
+        'locked_errors': totals['locked'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение профилей SQLite под конкурентной нагрузкой')
+    parser.add_argument('--processes', type=int, default=4, help='Количество процессов')
+    parser.add_argument('--threads', type=int, default=4, help='Потоков в каждом процессе')
+    parser.add_argument('--duration', type=float, default=10, help='Длительность для профиля, сек')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='Доля запросов на запись')
+    parser.add_argument('--seed', type=int, default=500, help='Количество задач перед началом')
+    parser.add_argument('--source', help='Исходная база для копирования (по умолчанию пустая)')
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=PROFILES)
+    args = parser.parse_args()
+
+    report = {'parameters': vars(args)}
+    for profile in args.profiles:
+        report[profile] = bench_profile(profile, args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# Сжатие ответов gzip/brotli (без зависимостей от Flask)
+# brotli - необязательная зависимость: без пакета brotli используется только gzip
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+}
+
+# Поддерживаемые кодировки в порядке предпочтения сервера
+def available_encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+# Функция выбора кодировки по заголовку Accept-Encoding (werkzeug MIMEAccept)
+def negotiate(accept_encodings):
+    best, best_quality = None, 0
+    for encoding in available_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+# Функция сжатия данных выбранной кодировкой
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        # Качество brotli 0-11, уровень gzip 1-9: 6 соответствует примерно 5
+        return brotli.compress(data, quality=min(11, max(0, level - 1)))
+    # mtime=0 - одинаковый результат для одинаковых данных
+    return gzip.compress(data, compresslevel=level, mtime=0)
@@ -0,0 +1,87 @@
+# Профили конфигурации приложения
+# Профиль выбирается переменной окружения APP_ENV (development/production),
+# переменные можно задать в файле .env рядом с приложением (см. .env.example)
+import os
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+load_dotenv(os.path.join(BASE_DIR, '.env'))
+
+# Базовая конфигурация (значения SQLite по умолчанию)
+class Config:
+    DEBUG = False
+    # Путь к файлу базы данных SQLite
+    DATABASE_PATH = os.path.abspath(os.getenv('DATABASE_PATH', os.path.join(BASE_DIR, 'todos.db')))
+    SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # PRAGMA, выполняемые на каждом новом соединении
+    SQLITE_PRAGMAS = {}
+    # Порог медленного запроса (мс): такие запросы пишутся в лог вместе с SQL, 0 - выключено
+    SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))
+    # Ограничение памяти кэша отрисованных карточек задач и бейджей тегов (байт)
+    FRAGMENT_CACHE_BYTES = int(os.getenv('FRAGMENT_CACHE_BYTES', 16 * 1024 * 1024))
+    # Сжатие ответов: минимальный размер (байт) и уровень gzip 1-9
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    # Время кэширования статики с отпечатком в адресе (сек)
+    STATIC_MAX_AGE = 365 * 24 * 3600
+    # Поток событий /api/events: интервал опроса таблицы событий (сек), сколько
+    # событий хранить, период пустых сообщений и длительность одного соединения
+    CHANGE_FEED_POLL_INTERVAL = float(os.getenv('CHANGE_FEED_POLL_INTERVAL', 0.5))
+    CHANGE_EVENTS_KEEP = int(os.getenv('CHANGE_EVENTS_KEEP', 10000))
+    SSE_HEARTBEAT_SECONDS = 15
+    SSE_MAX_SECONDS = int(os.getenv('SSE_MAX_SECONDS', 300))
+    SSE_RETRY_MS = 3000
+    # Не больше стольких открытых потоков на процесс (остальные получают 503),
+    # значение должно быть заметно меньше числа потоков gunicorn (GUNICORN_THREADS)
+    SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 16))
+    # Архив завершенных задач: возраст (дней после завершения, 0 - фоновая архивация
+    # выключена), интервал фоновых запусков (сек), размер пачки и пауза между пачками
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 0))
+    ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', 3600))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 1000))
+    ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', 0.05))
+    # Общий каталог метрик процессов для /metrics (пусто - только текущий процесс)
+    METRICS_DIR = os.getenv('METRICS_DIR') or None
+
+# Конфигурация для разработки
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+# Конфигурация для работы под нагрузкой с несколькими процессами
+class ProductionConfig(Config):
+    SQLITE_PRAGMAS = {
+        # Читатели не блокируются писателем и наоборот
+        'journal_mode': 'WAL',
+        # В режиме WAL fsync только при контрольной точке - безопасно и быстро
+        'synchronous': 'NORMAL',
+        # Ожидание блокировки вместо ошибки "database is locked" (мс)
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+        # Чтение файла базы через отображение в память (байт)
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Кэш страниц на соединение (отрицательное значение - в КиБ)
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+    # Несколько процессов gunicorn: /metrics суммирует значения всех процессов
+    METRICS_DIR = os.getenv('METRICS_DIR', Config.DATABASE_PATH + '-metrics')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        # Соединения с SQLite дешевые, но PRAGMA и кэш страниц живут в соединении,
+        # поэтому пул держит их открытыми для всех потоков процесса
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 8)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 8)),
+        'pool_timeout': 30,
+        'connect_args': {
+            'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)) / 1000,
+            'check_same_thread': False,
+        },
+    }
+
+configs = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
+
+# Функция получения класса конфигурации по APP_ENV
+def get_config():
+    return configs[os.getenv('APP_ENV', 'development')]
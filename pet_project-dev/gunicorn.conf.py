@@ -0,0 +1,29 @@
+# Конфигурация gunicorn для production (используется вместе с wsgi.py)
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+# Процессы обходят GIL, потоки внутри процесса делят пул соединений и кэши
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2, 8)))
+# Каждое открытое соединение /api/events занимает поток (ожидающий на Condition,
+# без обращений к базе), поэтому потоков заметно больше, чем соединений в пуле.
+# Таких соединений не больше SSE_MAX_STREAMS на процесс, остальные потоки
+# остаются обычным запросам
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+worker_class = 'gthread'
+timeout = 30
+# Приложение (и проверка структуры БД) загружается один раз до fork
+preload_app = True
+
+# Файлы метрик прошлого запуска удаляются: счетчики нового запуска начинаются с нуля
+def on_starting(server):
+    from app import app
+    if app.config['METRICS_DIR']:
+        shutil.rmtree(app.config['METRICS_DIR'], ignore_errors=True)
+
+# Соединения, открытые до fork, нельзя использовать в дочерних процессах
+def post_fork(server, worker):
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
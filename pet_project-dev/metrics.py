@@ -0,0 +1,173 @@
+# Простые метрики в формате Prometheus (без внешних зависимостей)
+# Значения хранятся в памяти процесса. При нескольких процессах gunicorn задается
+# общий каталог (spool_dir): каждый процесс раз в spool_interval секунд записывает
+# свои значения в отдельный файл, а /metrics складывает файлы всех процессов,
+# поэтому любой процесс отдает одни и те же суммарные счетчики
+import os, json, time, threading
+
+# Границы корзин по умолчанию для времени в секундах
+DEFAULT_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Гистограмма с метками (накопительные корзины, сумма и количество)
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}  # значения меток -> [счетчики корзин..., сумма, количество]
+
+    def observe(self, value, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return [(labels, list(series)) for labels, series in self.series.items()]
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def collect(self, items=None):
+        items = self.snapshot() if items is None else items
+        lines = []
+        for labels, series in sorted(items):
+            for bound, count in zip(self.buckets, series):
+                le = format_labels(self.labelnames, labels, {'le': format_value(float(bound))})
+                lines.append(f'{self.name}_bucket{le} {count}')
+            lines.append(f'{self.name}_bucket{format_labels(self.labelnames, labels, {"le": "+Inf"})} {series[-1]}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(series[-2])}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, labels)} {series[-1]}')
+        return lines
+
+# Счетчик с метками (только растет)
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.series.items())
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def collect(self, items=None):
+        items = self.snapshot() if items is None else items
+        return [f'{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}'
+                for labels, value in sorted(items)]
+
+# Реестр метрик и вывод в текстовом формате Prometheus
+class Registry:
+    def __init__(self, spool_dir=None, spool_interval=1.0):
+        self.metrics = []
+        self.spool_dir = spool_dir
+        self.spool_interval = spool_interval
+        self.lock = threading.Lock()
+        self.spool_pid = None  # процесс, для которого запущена запись файла
+        self.spool_path = None
+        self.spooled = None  # последнее записанное содержимое
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    # Запуск фоновой записи файла этого процесса. Потоки не переживают fork,
+    # поэтому в каждом процессе gunicorn запись запускается заново при первом вызове
+    def start_spool(self):
+        pid = os.getpid()
+        if not self.spool_dir or self.spool_pid == pid:
+            return
+        with self.lock:
+            if self.spool_pid == pid:
+                return
+            os.makedirs(self.spool_dir, exist_ok=True)
+            # Время запуска в имени: новый процесс с тем же pid не затрет старый файл
+            self.spool_path = os.path.join(self.spool_dir, f'{pid}-{time.time_ns()}.json')
+            self.spooled = None
+            self.spool_pid = pid
+            threading.Thread(target=self._spool_loop, args=(pid,), daemon=True).start()
+
+    def _spool_loop(self, pid):
+        while self.spool_pid == pid:
+            time.sleep(self.spool_interval)
+            self.flush()
+
+    # Запись значений процесса в его файл (атомарно, через временный файл)
+    def flush(self):
+        data = json.dumps({metric.name: metric.snapshot() for metric in self.metrics})
+        with self.lock:
+            if data == self.spooled:
+                return
+            temp_path = self.spool_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(data)
+            os.replace(temp_path, self.spool_path)
+            self.spooled = data
+
+    # Сумма значений всех процессов {имя метрики: [(метки, значение)]}
+    # Файлы завершившихся процессов остаются, чтобы счетчики не уменьшались
+    # (каталог очищается при запуске сервера, см. gunicorn.conf.py)
+    def _read_spool(self):
+        merged = {metric.name: {} for metric in self.metrics}
+        for filename in os.listdir(self.spool_dir):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric in self.metrics:
+                series = merged[metric.name]
+                for labels, value in data.get(metric.name, []):
+                    labels = tuple(labels)
+                    series[labels] = metric.merge(series[labels], value) if labels in series else value
+        return {name: list(series.items()) for name, series in merged.items()}
+
+    def render(self):
+        merged = {}
+        if self.spool_dir:
+            self.start_spool()
+            self.flush()
+            merged = self._read_spool()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.collect(merged.get(metric.name)))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,138 @@
+# Заполнение базы синтетическими данными для нагрузочного тестирования
+#
+# Пример (1М задач и 20К тегов во временной базе):
+#     python seed.py --db /tmp/todos-bench.db --todos 1000000 --tags 20000
+#
+# Популярность тегов распределена по закону Ципфа (несколько тегов встречаются
+# часто, большинство - редко), доли статусов задаются --status-mix.
+# Вставка идет напрямую через sqlite3 пачками, триггеры полнотекстового индекса
+# и очереди пересчета на время заполнения отключаются, а индексы, счетчики
+# тегов и задач и статистика по дням пересчитываются один раз в конце.
+import argparse
+import itertools
+import os
+import random
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+# Триггеры, которые отключаются на время массовой вставки
+SEED_DISABLED_TRIGGERS = [
+    'todo_fts_insert', 'todo_fts_delete', 'todo_fts_update',
+    'todo_tag_recount_insert', 'todo_tag_recount_delete',
+]
+
+WORDS = ('починить', 'обновить', 'проверить', 'написать', 'сервер', 'отчет', 'деплой',
+         'тесты', 'документацию', 'клиента', 'базу', 'релиз', 'интерфейс', 'логирование',
+         'оплату', 'письмо', 'встречу', 'бэкап', 'метрики', 'кэш')
+
+# Функция разбора долей статусов: "new=0.2,active=0.1,completed=0.7"
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        status, share = part.split('=')
+        mix[status.strip()] = float(share)
+    return mix
+
+# Функция генерации строк задач
+def generate_todos(args, rng, tag_names, tag_weights, start_id):
+    statuses = list(args.status_mix)
+    status_weights = list(itertools.accumulate(args.status_mix.values()))
+    now = datetime.now()
+    for todo_id in range(start_id, start_id + args.todos):
+        status = rng.choices(statuses, cum_weights=status_weights)[0]
+        created_at = now - timedelta(seconds=rng.randint(0, args.days * 86400))
+        started_at = completed_at = None
+        if status != 'new':
+            started_at = created_at + timedelta(seconds=rng.randint(60, 3 * 86400))
+        if status == 'completed':
+            completed_at = started_at + timedelta(seconds=rng.randint(60, 7 * 86400))
+        count = rng.randint(0, args.max_tags_per_todo)
+        tags = list(dict.fromkeys(rng.choices(tag_names, cum_weights=tag_weights, k=count)))
+        task = ' '.join(rng.choices(WORDS, k=rng.randint(2, 6))).capitalize()
+        yield todo_id, task, status, tags, created_at, started_at, completed_at
+
+def format_date(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f') if value else None
+
+# Функция вставки пачки задач и связей с тегами
+def flush(conn, todos, links):
+    conn.executemany("INSERT INTO todo (id, task, status, tags, created_at, started_at, completed_at, is_edited) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, 0)", todos)
+    conn.executemany("INSERT INTO todo_tag (tag_id, todo_id) VALUES (?, ?)", links)
+
+def main():
+    parser = argparse.ArgumentParser(description='Заполнение базы синтетическими задачами и тегами')
+    parser.add_argument('--db', required=True, help='Путь к заполняемой базе')
+    parser.add_argument('--copy-from', help='Скопировать эту базу перед заполнением')
+    parser.add_argument('--todos', type=int, default=100000, help='Количество задач')
+    parser.add_argument('--tags', type=int, default=2000, help='Количество тегов')
+    parser.add_argument('--max-tags-per-todo', type=int, default=4, help='Максимум тегов у задачи')
+    parser.add_argument('--status-mix', type=parse_mix, default=parse_mix('new=0.2,active=0.1,completed=0.7'),
+                        help='Доли статусов задач')
+    parser.add_argument('--days', type=int, default=365, help='Период дат создания, дней')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Показатель распределения популярности тегов')
+    parser.add_argument('--batch-size', type=int, default=20000, help='Строк в одной пачке вставки')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел')
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db)
+    if args.copy_from:
+        shutil.copy(args.copy_from, db_path)
+
+    # Создание актуальной схемы средствами приложения
+    os.environ['DATABASE_PATH'] = db_path
+    from app import app, db, check_and_upgrade_db, create_search_index, create_tag_recount_triggers, \
+        recount_task_counters, rebuild_daily_rollup, data_version, random_color, TAG_USAGE_SQL
+    check_and_upgrade_db()
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    for trigger in SEED_DISABLED_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    # Теги: существующие сохраняются, новые получают имена tag-N
+    existing = dict(conn.execute("SELECT name, id FROM tag"))
+    new_tags = [(f'tag-{i}', random_color()) for i in range(args.tags) if f'tag-{i}' not in existing]
+    conn.executemany("INSERT INTO tag (name, color, usage_count) VALUES (?, ?, 0)", new_tags)
+    tag_ids = dict(conn.execute("SELECT name, id FROM tag"))
+    tag_names = [f'tag-{i}' for i in range(args.tags)]
+    tag_weights = list(itertools.accumulate(1 / (rank + 1) ** args.zipf for rank in range(args.tags)))
+
+    # id не должны совпасть с удаленными и архивными задачами (todo - AUTOINCREMENT)
+    start_id = (conn.execute("SELECT MAX(seq) FROM sqlite_sequence WHERE name = 'todo'").fetchone()[0]
+                or conn.execute("SELECT MAX(id) FROM todo").fetchone()[0] or 0) + 1
+    todos, links = [], []
+    for todo_id, task, status, tags, created_at, started_at, completed_at in \
+            generate_todos(args, rng, tag_names, tag_weights, start_id):
+        todos.append((todo_id, task, status, ', '.join(tags), format_date(created_at),
+                      format_date(started_at), format_date(completed_at)))
+        links.extend((tag_ids[name], todo_id) for name in tags)
+        if len(todos) >= args.batch_size:
+            flush(conn, todos, links)
+            todos, links = [], []
+    flush(conn, todos, links)
+    conn.commit()
+    conn.close()
+    inserted = time.perf_counter() - started
+
+    # Пересчет счетчиков и статистики, восстановление триггеров и перестроение индекса поиска
+    with app.app_context(), db.engine.begin() as sa_conn:
+        sa_conn.execute(text(TAG_USAGE_SQL))
+        recount_task_counters(sa_conn)
+        rebuild_daily_rollup(sa_conn)
+        create_tag_recount_triggers(sa_conn)
+        create_search_index(sa_conn)
+        sa_conn.execute(text("DELETE FROM tag_recount_queue"))
+    data_version.bump('tasks', 'tags', 'tag_styles')
+
+    print(f"Добавлено задач: {args.todos}, тегов: {len(new_tags)}; "
+          f"вставка {inserted:.1f} с, всего {time.perf_counter() - started:.1f} с")
+
+if __name__ == '__main__':
+    main()
@@ -23,13 +23,82 @@ document.addEventListener('DOMContentLoaded', function() {
     function updateEmptyState() {
         const tasksContainer = document.getElementById('tasks-container');
         const emptyState = document.getElementById('empty-state');
+        if (!tasksContainer || !emptyState) return;
         
-        if (tasksContainer.children.length === 0) {
+        if (tasksContainer.querySelectorAll('.task-item:not(.disappearing)').length === 0) {
             emptyState.style.display = 'block';
         } else {
             emptyState.style.display = 'none';
         }
     }
+
+    // Живые обновления: события изменения задач из /api/events
+    const tasksContainer = document.getElementById('tasks-container');
+
+    function removeTaskCard(taskElement) {
+        if (!taskElement || taskElement.classList.contains('disappearing')) return;
+        taskElement.classList.add('disappearing');
+        setTimeout(() => {
+            taskElement.remove();
+            updateEmptyState();
+        }, 300);
+    }
+
+    // Загрузка карточки с сервера: замена существующей или вставка в начало списка
+    async function loadTaskCard(taskId) {
+        const response = await fetch(`/api/tasks/${taskId}/card`);
+        if (!response.ok) return;
+        const template = document.createElement('template');
+        template.innerHTML = (await response.text()).trim();
+        const card = template.content.firstElementChild;
+        const existing = document.getElementById(`task-${taskId}`);
+        if (existing) {
+            existing.replaceWith(card);
+        } else {
+            tasksContainer.prepend(card);
+        }
+        card.classList.add('updated-highlight');
+        setTimeout(() => card.classList.remove('updated-highlight'), 1000);
+        updateEmptyState();
+    }
+
+    function applyTaskEvent(event) {
+        const tab = tasksContainer.dataset.tab;
+        const taskElement = document.getElementById(`task-${event.id}`);
+        // Задача удалена или ушла из текущей вкладки
+        if (event.type === 'deleted' || (taskElement && tab !== 'filter' && event.status !== tab)) {
+            removeTaskCard(taskElement);
+            return;
+        }
+        if (taskElement) {
+            if (!taskElement.classList.contains('disappearing')) loadTaskCard(event.id);
+            return;
+        }
+        // Новые для вкладки задачи добавляются только на первой странице
+        if (tasksContainer.dataset.firstPage !== 'true') return;
+        const fits = tab === 'filter'
+            ? (event.tags || []).includes(tasksContainer.dataset.tag)
+            : event.status === tab && event.type !== 'edited';
+        if (fits) loadTaskCard(event.id);
+    }
+
+    function openEvents() {
+        const events = new EventSource('/api/events');
+        events.addEventListener('task', (e) => applyTaskEvent(JSON.parse(e.data)));
+        events.addEventListener('counters', (e) => updateTaskCounters(JSON.parse(e.data)));
+        // Пропущено слишком много событий - страница загружается заново
+        events.addEventListener('reset', () => location.reload());
+        // Сервер занят (503) - браузер сам не переподключается, повтор через 15-30 с
+        events.addEventListener('error', () => {
+            if (events.readyState === EventSource.CLOSED) {
+                setTimeout(openEvents, 15000 + Math.random() * 15000);
+            }
+        });
+    }
+
+    if (tasksContainer && window.EventSource) {
+        openEvents();
+    }
     // Общая функция для обработки действий с задачами
     async function handleTaskAction(action, taskId) {
         const taskElement = document.getElementById(`task-${taskId}`);
@@ -47,13 +116,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 if (data.counters) {
                     updateTaskCounters(data.counters);
                 }
-                // Добавляем класс для анимации исчезновения
-                taskElement.classList.add('disappearing');
-                 // Удаляем элемент после анимации
-                setTimeout(() => {
-                    taskElement.remove();
-                    updateEmptyState();
-                    }, 300);
+                // Удаляем элемент после анимации исчезновения
+                removeTaskCard(taskElement);
             } else {
                 showAlert(data.message || 'Ошибка операции', 'error');
             }
@@ -76,14 +140,16 @@ document.addEventListener('DOMContentLoaded', function() {
 
     if (newTagInput) {
         newTagInput.addEventListener('input', async function() {
-            const search = this.value;
-            if (search.length < 2) {
+            // Ищем только по последнему тегу в строке
+            const parts = this.value.split(',');
+            const search = parts[parts.length - 1].trim();
+            if (search.length < 1) {
                 newTagSuggestions.style.display = 'none';
                 return;
             }
             
             try {
-                const response = await fetch(`/api/tags?search=${encodeURIComponent(search)}`);
+                const response = await fetch(`/api/tags?search=${encodeURIComponent(search)}&mode=prefix`);
                 const tags = await response.json();
                 
                 newTagSuggestions.innerHTML = '';
@@ -93,7 +159,10 @@ document.addEventListener('DOMContentLoaded', function() {
                     suggestion.textContent = tag;
                     suggestion.addEventListener('click', (e) => {
                         e.preventDefault();
-                        this.value = this.value ? `${this.value}, ${tag}` : tag;
+                        // Заменяем введенный фрагмент выбранным тегом
+                        const entered = this.value.split(',').slice(0, -1).map(t => t.trim()).filter(Boolean);
+                        entered.push(tag);
+                        this.value = entered.join(', ');
                         newTagSuggestions.style.display = 'none';
                     });
                     newTagSuggestions.appendChild(suggestion);
@@ -118,15 +187,15 @@ document.addEventListener('DOMContentLoaded', function() {
     // Обработчик обновления тегов
     document.getElementById('refresh-tags').addEventListener('click', async () => {
         const loadingIndicator = document.getElementById('loading-indicator');
-        loadingIndicator.style.display = 'flex';
+        if (loadingIndicator) loadingIndicator.style.display = 'flex';
         
         try {
-            await fetch('/refresh-tags');
+            await fetch('/refresh-tags?mode=incremental');
             location.reload();
         } catch (error) {
             showAlert('Ошибка при обновлении тегов', 'error');
         } finally {
-            loadingIndicator.style.display = 'none';
+            if (loadingIndicator) loadingIndicator.style.display = 'none';
         }
     });
 
@@ -0,0 +1,15 @@
+# Точка входа WSGI для production
+#
+# Запуск (несколько процессов, в каждом несколько потоков):
+#     APP_ENV=production gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Количество процессов и потоков задается переменными WEB_CONCURRENCY и
+# GUNICORN_THREADS (см. gunicorn.conf.py). Все процессы работают с одним файлом
+# SQLite в режиме WAL: чтения идут параллельно, записи ждут друг друга
+# не дольше SQLITE_BUSY_TIMEOUT вместо ошибки "database is locked".
+# На Windows вместо gunicorn можно использовать waitress:
+#     waitress-serve --threads=8 --port=5000 wsgi:app
+from app import app, check_and_upgrade_db
+
+# Проверка структуры БД один раз при загрузке приложения
+check_and_upgrade_db()